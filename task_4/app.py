@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import os
 
@@ -17,31 +18,168 @@ except ImportError:
     import matplotlib.pyplot as plt
     PLOTLY_AVAILABLE = False
 
+# orjson быстрее разбирает большие файлы результатов, но не обязателен
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Файлы результатов лежат внутри папки task_4
+RESULTS_DIR = "task_4"
+RESULTS_SUFFIX = "_results.json"
+CUBE_SUFFIX = "_cube.parquet"
+
+# Seconds a parsed results file stays cached
+CACHE_TTL = 600
+
 # --------------------------
 # Load JSON data
 # --------------------------
-def load_json(folder):
-    # Ищем файлы внутри папки task_4
-    path_main = os.path.join("task_4", f"{folder}_results.json")
-    st.write(f"Trying path: {path_main}")  # для отладки
-    if os.path.exists(path_main):
-        with open(path_main, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return None
+def results_path(folder):
+    return os.path.join(RESULTS_DIR, f"{folder}{RESULTS_SUFFIX}")
+
+
+def discover_datasets():
+    """Dataset names that have a results file, sorted."""
+    try:
+        names = os.listdir(RESULTS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(n[:-len(RESULTS_SUFFIX)] for n in names if n.endswith(RESULTS_SUFFIX))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _load_results(path, mtime_ns, size):
+    # mtime и размер входят в ключ кэша: обновлённый файл перечитывается
+    with open(path, "rb") as f:
+        data = json_loads(f.read())
+
+    # daily_revenue — список {date, paid_price} или, в формате columnar,
+    # готовые колонки {date: [...], paid_price: [...]}
+    df_rev = pd.DataFrame(data.get("daily_revenue", []), columns=["date", "paid_price"])
+    df_rev["date"] = pd.to_datetime(df_rev["date"])
+    df_rev["paid_price"] = df_rev["paid_price"].astype(float)
+    df_rev = df_rev.sort_values("date", ignore_index=True)
+
+    top5 = pd.DataFrame({"date": pd.to_datetime(data.get("top_5_days", []))})
+    top5 = top5.sort_values("date", ascending=False)
+
+    return {
+        "data": data,
+        "daily_revenue": df_rev,
+        "top_5_days": top5,
+        "total_revenue": float(df_rev["paid_price"].sum()),
+    }
+
+
+def load_results(folder):
+    """Parsed results with ready-to-plot frames, or None if there is no file.
+
+    Parsing is cached until the file changes or CACHE_TTL runs out.
+    """
+    path = results_path(folder)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _load_results(path, stat.st_mtime_ns, stat.st_size)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _load_cube(path, mtime_ns, size):
+    cube = pd.read_parquet(path)
+    cube["date"] = pd.to_datetime(cube["date"])
+    return cube
+
+
+def load_cube(folder):
+    """The dataset's rollup cube, or None if the pipeline did not write one."""
+    path = os.path.join(RESULTS_DIR, f"{folder}{CUBE_SUFFIX}")
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _load_cube(path, stat.st_mtime_ns, stat.st_size)
+
+# --------------------------
+# Chart downsampling
+# --------------------------
+CHART_RESOLUTIONS = ["Auto", "Day", "Week", "Month"]
+
+# Calendar rollups: weeks start on Monday, months on the 1st
+ROLLUP_RULES = {"Week": "W-MON", "Month": "MS"}
+
+DEFAULT_CHART_POINTS = 500
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of n_out points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point spanning the largest triangle with its
+    neighbours, so spikes survive.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = [0]
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nx = x[hi:edges[i + 2]].mean()
+            ny = y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        picked.append(a)
+    picked.append(n - 1)
+    return np.array(picked)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def chart_frame(df_rev, peak_dates, start, end, resolution, max_points):
+    """Daily revenue between start and end, shaped for plotting.
+
+    Week and Month sum days into calendar buckets. Day plots every day.
+    Auto plots every day that fits in max_points, otherwise thins the
+    days with LTTB while always keeping peak_dates.
+    """
+    df = df_rev[(df_rev["date"] >= pd.Timestamp(start)) & (df_rev["date"] <= pd.Timestamp(end))]
+
+    if resolution in ROLLUP_RULES:
+        return (
+            df.resample(ROLLUP_RULES[resolution], on="date", label="left", closed="left")["paid_price"]
+            .sum()
+            .reset_index()
+        )
+    if resolution == "Day" or len(df) <= max_points:
+        return df
+
+    peaks = np.flatnonzero(df["date"].isin(peak_dates).to_numpy())
+    x = df["date"].to_numpy().astype("int64").astype(float)
+    y = df["paid_price"].to_numpy()
+    keep = lttb_indices(x, y, max(max_points - len(peaks), 3))
+    return df.iloc[np.union1d(keep, peaks)]
 
 # --------------------------
 # Render a single tab
 # --------------------------
 def render_tab(folder_name):
     st.header(f"📊 Dataset: {folder_name}")
-    data = load_json(folder_name)
-    if not data:
+    results = load_results(folder_name)
+    if not results or not results["data"]:
         st.warning(f"No data found for {folder_name}. Make sure the JSON file exists.")
         return
-    
+    data = results["data"]
+    df_rev = results["daily_revenue"]
+    top5 = results["top_5_days"]
+
     # --- KPI CARDS ---
-    df_rev = pd.DataFrame(data.get("daily_revenue", []))
-    total_rev = df_rev["paid_price"].sum() if not df_rev.empty else 0
+    total_rev = results["total_revenue"]
 
     full_author_list = data.get("most_popular_author", "N/A")
 
@@ -63,48 +201,89 @@ def render_tab(folder_name):
 
     # --- Top 5 Days ---
     st.subheader("📅 Top 5 Days by Revenue")
-    top5 = pd.DataFrame({"date": data.get("top_5_days", [])})
     if not top5.empty:
-        top5["date"] = pd.to_datetime(top5["date"])
-        st.dataframe(top5.sort_values("date", ascending=False))
+        st.dataframe(top5)
     else:
         st.info("No top 5 days data available.")
 
     # --- Daily Revenue Chart ---
     st.subheader("💰 Daily Revenue Chart")
     if not df_rev.empty:
-        df_rev["date"] = pd.to_datetime(df_rev["date"])
-        df_rev = df_rev.sort_values("date")
+        range_col, res_col, points_col = st.columns([3, 1, 1])
+        first, last = df_rev["date"].iloc[0].date(), df_rev["date"].iloc[-1].date()
+        if first < last:
+            start, end = range_col.slider("Date range", first, last, (first, last))
+        else:
+            start, end = first, last
+        resolution = res_col.selectbox("Resolution", CHART_RESOLUTIONS)
+        max_points = int(points_col.number_input(
+            "Max points", min_value=10, value=DEFAULT_CHART_POINTS, step=50
+        ))
+
+        # Меньше точек — меньше payload для браузера
+        df_plot = chart_frame(df_rev, list(top5["date"]), start, end, resolution, max_points)
+        title = {
+            "Week": "Weekly Revenue Over Time",
+            "Month": "Monthly Revenue Over Time",
+        }.get(resolution, "Daily Revenue Over Time")
+
         if PLOTLY_AVAILABLE:
             fig = px.line(
-                df_rev,
+                df_plot,
                 x="date",
                 y="paid_price",
-                title="Daily Revenue Over Time",
+                title=title,
                 markers=True,
                 labels={"paid_price": "Revenue (USD)", "date": "Date"}
             )
             st.plotly_chart(fig, use_container_width=True)
         else:
             fig, ax = plt.subplots(figsize=(10, 4))
-            ax.plot(df_rev["date"], df_rev["paid_price"], marker='o', linestyle='-', color='tab:blue')
+            ax.plot(df_plot["date"], df_plot["paid_price"], marker='o', linestyle='-', color='tab:blue')
             ax.set_ylabel("Revenue (USD)")
             ax.set_xlabel("Date")
-            ax.set_title("Daily Revenue Over Time")
+            ax.set_title(title)
             ax.grid(True)
             st.pyplot(fig)
     else:
         st.info("No daily revenue data available.")
 
+    # --- Revenue Explorer ---
+    # Срезы считаются по предагрегированному кубу, без сырых заказов
+    cube = load_cube(folder_name)
+    if cube is not None and not cube.empty:
+        st.subheader("🔎 Revenue Explorer")
+        dim_col, genre_col, pub_col = st.columns(3)
+        dimension = dim_col.selectbox("Break down by", ["genre", "publisher", "author", "user_group"])
+        genres = genre_col.multiselect("Genre", sorted(cube["genre"].dropna().unique()))
+        publishers = pub_col.multiselect("Publisher", sorted(cube["publisher"].dropna().unique()))
+
+        view = cube
+        if genres:
+            view = view[view["genre"].isin(genres)]
+        if publishers:
+            view = view[view["publisher"].isin(publishers)]
+        breakdown = (
+            view.groupby(dimension, dropna=False)[["paid_price", "quantity"]]
+            .sum()
+            .sort_values("paid_price", ascending=False)
+            .head(20)
+        )
+        st.bar_chart(breakdown["paid_price"])
+        st.dataframe(breakdown)
+    elif cube is None:
+        st.caption(f"Revenue Explorer: run the pipeline with --cube to write {folder_name}{CUBE_SUFFIX}.")
+
 # --------------------------
-# Tabs
+# Dataset selector
 # --------------------------
-tabs = st.tabs(["DATA1", "DATA2", "DATA3"])
-folders = ["DATA1", "DATA2", "DATA3"]
-
-for tab_obj, folder in zip(tabs, folders):
-    with tab_obj:
-        render_tab(folder)
+# Рендерим только выбранный датасет, а не все вкладки сразу
+folders = discover_datasets()
+if folders:
+    folder = st.sidebar.selectbox("Dataset", folders)
+    render_tab(folder)
+else:
+    st.warning(f"No *{RESULTS_SUFFIX} files found in {RESULTS_DIR}. Run the pipeline first.")
 
 
 
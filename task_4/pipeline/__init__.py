@@ -0,0 +1,12 @@
+"""Book store data pipeline.
+
+    from pipeline import process
+    results = process("DATA1")
+
+or from the command line::
+
+    python -m pipeline DATA1 DATA2 DATA3
+"""
+from .core import process
+
+__all__ = ["process"]
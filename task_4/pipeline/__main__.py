@@ -0,0 +1,92 @@
+"""Command line entry point: ``python -m pipeline DATASET_DIR [DATASET_DIR ...]``."""
+import argparse
+import time
+from pathlib import Path
+
+from .batch import RESULTS_FORMATS, check_dataset_names, run_batch
+from .cache import DEFAULT_CACHE_BYTES, DEFAULT_CACHE_DIR, TableCache
+from .charts import CHART_MODES
+from .load import ENGINES, ORDER_BATCH_SIZE
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m pipeline",
+        description="Process book store datasets into <name>_results.json files.",
+    )
+    ap.add_argument("datasets", nargs="+", type=Path,
+                    help="dataset directories with users.csv, books.yaml and orders.parquet")
+    ap.add_argument("-j", "--workers", type=int, default=None,
+                    help="worker processes (default: one per CPU, at most one per dataset)")
+    ap.add_argument("-o", "--output-dir", type=Path, default=None,
+                    help="where to write <name>_results.json (default: next to each dataset)")
+    ap.add_argument("--clean-workers", type=int, default=1,
+                    help="processes cleaning the orders of each dataset, on top of -j "
+                         "(default: 1, clean in the dataset's own process)")
+    ap.add_argument("--engine", choices=ENGINES, default="pandas",
+                    help="clean and aggregate orders as pandas DataFrames (default) "
+                         "or as Arrow tables with pyarrow.compute kernels")
+    ap.add_argument("--results-format", choices=RESULTS_FORMATS, default="pretty",
+                    help="indented JSON (default), minified JSON (via orjson if installed), "
+                         "or minified with daily revenue as columns")
+    ap.add_argument("--incremental", action="store_true",
+                    help="checkpoint order aggregates per dataset and only process new orders")
+    ap.add_argument("--batch-size", type=int, default=ORDER_BATCH_SIZE,
+                    help=f"orders streamed per batch (default: {ORDER_BATCH_SIZE})")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR,
+                    help=f"cache of cleaned tables (default: {DEFAULT_CACHE_DIR})")
+    ap.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES >> 20,
+                    help="cache size limit in MiB; least recently used entries go first "
+                         f"(default: {DEFAULT_CACHE_BYTES >> 20})")
+    ap.add_argument("--no-cache", action="store_true", help="always clean inputs from scratch")
+    ap.add_argument("--profile", action="store_true",
+                    help="write per-stage timings to <name>_profile.json next to the results")
+    ap.add_argument("--cprofile", action="store_true",
+                    help="with --profile, also dump cProfile stats per stage to <name>_profile/")
+    ap.add_argument("--trace-memory", action="store_true",
+                    help="with --profile, also record tracemalloc peaks per stage (slow)")
+    ap.add_argument("--fuzzy-users", action="store_true",
+                    help="also merge near-duplicate users (similar names, addresses, ...) "
+                         "when counting unique users")
+    ap.add_argument("--cube", action="store_true",
+                    help="also write <name>_cube.parquet for the dashboard's Revenue Explorer; "
+                         "its cells (about one per order) are kept in memory, so peak memory "
+                         "then grows with the number of orders")
+    ap.add_argument("--chart", choices=CHART_MODES, default="background",
+                    help="render revenue charts on a background thread (default), "
+                         "inline, or not at all")
+    ap.add_argument("--no-chart", dest="chart", action="store_const", const="off",
+                    help="same as --chart off")
+    ap.add_argument("-q", "--quiet", action="store_true", help="only report written files")
+    args = ap.parse_args(argv)
+    try:
+        check_dataset_names(args.datasets)
+    except ValueError as e:
+        ap.error(str(e))
+
+    cache = None if args.no_cache else TableCache(args.cache_dir, args.cache_size << 20)
+
+    start = time.perf_counter()
+    timings = run_batch(
+        args.datasets,
+        workers=args.workers,
+        output_dir=args.output_dir,
+        chart=args.chart,
+        verbose=not args.quiet,
+        incremental=args.incremental,
+        batch_size=args.batch_size,
+        cache=cache,
+        profile=args.profile,
+        cprofile=args.cprofile,
+        trace_memory=args.trace_memory,
+        fuzzy_users=args.fuzzy_users,
+        clean_workers=args.clean_workers,
+        engine=args.engine,
+        results_format=args.results_format,
+        cube=args.cube,
+    )
+    print(f"Processed {len(timings)} dataset(s) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Running aggregates over cleaned orders, with an on-disk checkpoint.
+
+Orders are folded one batch at a time. A full run folds every order into
+empty aggregates; an incremental run loads the checkpoint and folds only
+orders with an id above its high-water mark. Money totals are kept as
+integer mills (see MONEY_SCALE), so the fold order never changes a result
+and both runs give identical numbers.
+
+The rollup cube's cells are only kept when asked for, in a compact
+CellTable that is checkpointed to parquet next to the JSON checkpoint.
+"""
+import datetime as dt
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Bump when cleaning or aggregation rules change: old checkpoints are
+# then ignored and the next run rebuilds from scratch.
+STATE_VERSION = 8
+
+# Money is summed in integer mills (1/1000 USD). A whole-cent price, in
+# USD or in EUR at EUR_TO_USD = 1.2, gives a paid_price of whole mills,
+# so integer sums are exact in any order. Finer prices ("12.3456 USD")
+# are rounded to the mill and counted in OrderAggregates.rounded_rows.
+MONEY_SCALE = 1000
+
+CELL_KEYS = ["day", "book_id", "user_id"]
+CELL_COLUMNS = CELL_KEYS + ["paid_mills", "quantity"]
+
+
+def to_mills(paid_price):
+    """paid_price as int64 mills, and how many values were not whole
+    mills and got rounded. NaN (no price) counts as 0."""
+    scaled = np.nan_to_num(np.asarray(paid_price, dtype=np.float64)) * MONEY_SCALE
+    mills = np.rint(scaled)
+    # Float noise on whole mills is ~1e-9; anything more is a finer price
+    rounded = np.count_nonzero(~np.isclose(scaled, mills, rtol=1e-12, atol=1e-6))
+    return mills.astype(np.int64), int(rounded)
+
+
+def cells_path(state_path):
+    """Where a checkpoint keeps its cube cells: <checkpoint>.cells.parquet."""
+    state_path = Path(state_path)
+    return state_path.with_name(f"{state_path.stem}.cells.parquet")
+
+
+class CellTable:
+    """Revenue (in mills) and quantity per day, book and user: the finest
+    grain of the rollup cube.
+
+    Every batch is grouped on its own and kept as a part; parts are
+    merged into one frame whenever they outgrow it, so memory stays
+    proportional to the number of cells at amortized linear cost.
+    """
+
+    def __init__(self, frame=None):
+        self.frame = frame if frame is not None else _empty_cells()
+        self._parts = []
+        self._part_rows = 0
+
+    def add(self, dates, book_ids, user_ids, paid_mills, quantities):
+        """Fold one batch of orders, given as arrays."""
+        part = pd.DataFrame({
+            "day": np.asarray(dates, dtype="datetime64[D]").astype(np.int32),
+            "book_id": np.asarray(book_ids, dtype=np.int64),
+            "user_id": np.asarray(user_ids, dtype=np.int64),
+            "paid_mills": np.asarray(paid_mills, dtype=np.int64),
+            "quantity": np.asarray(quantities, dtype=np.int64),
+        })
+        part = part.groupby(CELL_KEYS, sort=False, as_index=False).sum()
+        self._parts.append(part)
+        self._part_rows += len(part)
+        if self._part_rows > len(self.frame):
+            self._merge()
+
+    def _merge(self):
+        if self._parts:
+            merged = pd.concat([self.frame, *self._parts], ignore_index=True)
+            self.frame = merged.groupby(CELL_KEYS, sort=False, as_index=False).sum()
+            self._parts = []
+            self._part_rows = 0
+
+    def to_frame(self):
+        """All cells (CELL_COLUMNS), sorted by CELL_KEYS."""
+        self._merge()
+        self.frame = self.frame.sort_values(CELL_KEYS, ignore_index=True)
+        return self.frame
+
+
+def _empty_cells():
+    return pd.DataFrame({
+        "day": np.array([], dtype=np.int32),
+        **{col: np.array([], dtype=np.int64) for col in CELL_COLUMNS[1:]},
+    })
+
+
+class OrderAggregates:
+    def __init__(self, cells=False):
+        self.daily_revenue = {}   # "YYYY-MM-DD" -> paid_price in mills
+        self.user_spend = {}      # user_id -> paid_price in mills
+        self.book_quantity = {}   # book_id -> quantity sold
+        # Rollup cube cells, only kept with cells=True
+        self.cells = CellTable() if cells else None
+        self.rounded_rows = 0     # orders whose paid_price was not whole mills
+        # Raw order ids folded so far (including rows cleaning dropped)
+        self.max_order_id = None
+        self.seen_rows = 0
+        self.seen_id_sum = 0
+
+    def fold(self, df_orders, raw_ids=None):
+        """Add cleaned orders; raw_ids are all ids of the raw rows they came from.
+
+        df_orders is a DataFrame or, from the arrow engine, a pa.Table.
+        Without raw_ids the id bookkeeping (max_order_id, seen_rows,
+        seen_id_sum) is left to the caller.
+        """
+        if isinstance(df_orders, pa.Table):
+            self._fold_table(df_orders)
+        else:
+            self._fold_frame(df_orders)
+
+        if raw_ids is None:
+            return
+        if len(raw_ids):
+            top = int(raw_ids.max())
+            self.max_order_id = top if self.max_order_id is None else max(self.max_order_id, top)
+        self.seen_rows += len(raw_ids)
+        self.seen_id_sum += int(raw_ids.sum())
+
+    def _fold_frame(self, df_orders):
+        mills, rounded = to_mills(df_orders["paid_price"])
+        self.rounded_rows += rounded
+        mills = pd.Series(mills, index=df_orders.index)
+        by_day = mills.groupby(df_orders["date"]).sum()
+        _fold_totals(self.daily_revenue, by_day.index.strftime("%Y-%m-%d").tolist(),
+                     by_day.tolist())
+        by_user = mills.groupby(df_orders["user_id"]).sum()
+        _fold_totals(self.user_spend, by_user.index.tolist(), by_user.tolist())
+        by_book = df_orders.groupby("book_id")["quantity"].sum()
+        _fold_totals(self.book_quantity, by_book.index.tolist(), by_book.tolist())
+
+        if self.cells is not None:
+            self.cells.add(df_orders["date"].to_numpy(), df_orders["book_id"].to_numpy(),
+                           df_orders["user_id"].to_numpy(), mills.to_numpy(),
+                           df_orders["quantity"].to_numpy())
+
+    def _fold_table(self, table):
+        # Integer sums in Arrow's group_by are exact, whatever order its
+        # threads add them up in
+        mills, rounded = to_mills(table["paid_price"].to_numpy())
+        self.rounded_rows += rounded
+        keyed = pa.table({
+            "date": table["date"], "user_id": table["user_id"], "book_id": table["book_id"],
+            "paid_mills": mills,
+            "quantity": table["quantity"],
+        })
+        by_day = keyed.group_by("date").aggregate([("paid_mills", "sum")])
+        _fold_totals(self.daily_revenue, pc.strftime(by_day["date"], "%Y-%m-%d").to_pylist(),
+                     by_day["paid_mills_sum"].to_pylist())
+        by_user = keyed.group_by("user_id").aggregate([("paid_mills", "sum")])
+        _fold_totals(self.user_spend, by_user["user_id"].to_pylist(),
+                     by_user["paid_mills_sum"].to_pylist())
+        by_book = keyed.group_by("book_id").aggregate([("quantity", "sum")])
+        _fold_totals(self.book_quantity, by_book["book_id"].to_pylist(),
+                     by_book["quantity_sum"].to_pylist())
+
+        if self.cells is not None:
+            self.cells.add(*(keyed[col].to_numpy() for col in
+                             ["date", "book_id", "user_id", "paid_mills", "quantity"]))
+
+    def covers(self, id_batches):
+        """Whether the ids at or below the high-water mark are exactly the
+        ones folded so far, i.e. the orders were only appended to since.
+
+        id_batches is an iterable of raw order id Series.
+        """
+        rows = id_sum = 0
+        for ids in id_batches:
+            if self.max_order_id is not None:
+                ids = ids[ids <= self.max_order_id]
+            else:
+                ids = ids[:0]
+            rows += len(ids)
+            id_sum += int(ids.sum())
+        return rows == self.seen_rows and id_sum == self.seen_id_sum
+
+    # ---- results -------------------------------------------------------
+
+    def daily_revenue_frame(self):
+        """date / paid_price, one row per day in date order."""
+        days = sorted(self.daily_revenue)
+        return pd.DataFrame({
+            "date": [dt.date.fromisoformat(d) for d in days],
+            "paid_price": [self.daily_revenue[d] / MONEY_SCALE for d in days],
+        })
+
+    def user_spending_frame(self):
+        """user_id / paid_price in user_id order."""
+        users = sorted(self.user_spend)
+        return pd.DataFrame({
+            "user_id": users,
+            "paid_price": [self.user_spend[u] / MONEY_SCALE for u in users],
+        })
+
+    def book_quantity_series(self):
+        return pd.Series(self.book_quantity, name="quantity", dtype="int64").sort_index()
+
+    def cells_frame(self):
+        """date / book_id / user_id / paid_mills / quantity, one row per
+        combination that has orders, sorted by those keys. Only with
+        cells=True."""
+        cells = self.cells.to_frame()
+        return pd.DataFrame({
+            "date": cells["day"].to_numpy().astype("datetime64[D]"),
+            **{col: cells[col] for col in CELL_COLUMNS[1:]},
+        })
+
+    # ---- checkpoint ----------------------------------------------------
+
+    def save(self, path):
+        state = {
+            "version": STATE_VERSION,
+            "max_order_id": self.max_order_id,
+            "seen_rows": self.seen_rows,
+            "seen_id_sum": self.seen_id_sum,
+            "daily_revenue": self.daily_revenue,
+            "user_spend": {str(k): v for k, v in self.user_spend.items()},
+            "book_quantity": {str(k): v for k, v in self.book_quantity.items()},
+            "rounded_rows": self.rounded_rows,
+        }
+        # Written aside and swapped in: a crash never leaves half a checkpoint.
+        # Cells go first and are tagged with what they cover, so cells
+        # and JSON from different runs are told apart on load.
+        path = Path(path)
+        if self.cells is None:
+            cells_path(path).unlink(missing_ok=True)
+        else:
+            table = pa.Table.from_pandas(self.cells.to_frame(), preserve_index=False)
+            table = table.replace_schema_metadata({
+                **table.schema.metadata, b"covers": _covers_tag(state).encode(),
+            })
+            _replace(cells_path(path), lambda tmp: pq.write_table(table, tmp))
+        _replace(path, lambda tmp: tmp.write_text(json.dumps(state), encoding="utf-8"))
+
+    @classmethod
+    def load(cls, path, cells=False):
+        """Read a checkpoint; None if it is missing, unreadable or from
+        another version, so that the run rebuilds it. With cells, also
+        None if the checkpoint has no matching cube cells."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return None
+        try:
+            agg = cls._from_state(state)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+        if cells:
+            try:
+                table = pq.read_table(cells_path(path))
+            except (FileNotFoundError, pa.ArrowInvalid):
+                return None
+            if (table.schema.metadata or {}).get(b"covers") != _covers_tag(state).encode():
+                return None
+            agg.cells = CellTable(table.to_pandas())
+        return agg
+
+    @classmethod
+    def _from_state(cls, state):
+        agg = cls()
+        agg.max_order_id = state["max_order_id"]
+        agg.seen_rows = state["seen_rows"]
+        agg.seen_id_sum = state["seen_id_sum"]
+        agg.daily_revenue = state["daily_revenue"]
+        agg.user_spend = {int(k): v for k, v in state["user_spend"].items()}
+        agg.book_quantity = {int(k): v for k, v in state["book_quantity"].items()}
+        agg.rounded_rows = state["rounded_rows"]
+        return agg
+
+
+def _covers_tag(state):
+    return f'{state["seen_rows"]} {state["seen_id_sum"]} {state["max_order_id"]}'
+
+
+def _replace(path, write):
+    # write(tmp) then swap tmp in for path
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _fold_totals(totals, keys, values):
+    # Add one batch's per-group sums (lists of Python values) into totals
+    for key, value in zip(keys, values):
+        totals[key] = totals.get(key, 0) + value
@@ -0,0 +1,71 @@
+"""Integer ids for authors and author sets.
+
+A book's author field is a comma separated list. Its author set is the
+sorted tuple of the parts exactly as written, and the individual authors
+are the parts with surrounding whitespace removed. Sets and authors get
+dense integer ids in sorted order, and books are linked to both through
+arrays, so counting and popularity run on integers instead of tuples.
+"""
+import numpy as np
+import pandas as pd
+
+
+def author_set(author):
+    return tuple(sorted(author.split(","))) if isinstance(author, str) else (str(author),)
+
+
+class AuthorIndex:
+    """Interned authors of a books table.
+
+    sets        author set tuples, sorted; a set id is a position here
+    names       individual author names, sorted; an author id is a position here
+    book_set    set id of every book row
+    set_indptr, set_authors
+                set -> author ids in CSR form: the authors of set s are
+                set_authors[set_indptr[s]:set_indptr[s + 1]]
+    book_indptr, book_authors
+                the same book -> author incidence for every book row
+    """
+
+    def __init__(self, authors):
+        # Books share author strings, so sets are only built per distinct string
+        values = pd.Series(authors, dtype=object).to_numpy()
+        raw_codes, raw = pd.factorize(values)
+        raw_sets = [author_set(a) for a in raw]
+        # factorize lumps None and NaN together; missing authors keep
+        # their own label, ('None',) or ('nan',)
+        known = raw_codes >= 0
+        missing_sets = [author_set(a) for a in values[~known]]
+        self.sets = sorted(set(raw_sets) | set(missing_sets))
+        set_id = {s: i for i, s in enumerate(self.sets)}
+        self.book_set = np.empty(len(values), dtype=np.int64)
+        self.book_set[known] = np.array([set_id[s] for s in raw_sets], dtype=np.int64)[raw_codes[known]]
+        self.book_set[~known] = [set_id[s] for s in missing_sets]
+
+        members = [[a.strip() for a in s] for s in self.sets]
+        self.names = sorted({a for m in members for a in m})
+        name_id = {a: i for i, a in enumerate(self.names)}
+        lens = np.array([len(m) for m in members], dtype=np.int64)
+        self.set_indptr = np.concatenate([[0], np.cumsum(lens)])
+        self.set_authors = np.array([name_id[a] for m in members for a in m], dtype=np.int64)
+
+        book_lens = lens[self.book_set]
+        self.book_indptr = np.concatenate([[0], np.cumsum(book_lens)])
+        offsets = np.arange(self.book_indptr[-1]) - np.repeat(self.book_indptr[:-1], book_lens)
+        self.book_authors = self.set_authors[np.repeat(self.set_indptr[self.book_set], book_lens) + offsets]
+
+    def __len__(self):
+        return len(self.sets)
+
+    def set_labels(self):
+        """Display form of every set: its parts joined with ", "."""
+        return np.array([", ".join(s) for s in self.sets], dtype=object)
+
+    def set_totals(self, values):
+        """Sum per-book-row values onto author sets."""
+        return np.bincount(self.book_set, weights=values, minlength=len(self.sets))
+
+    def author_totals(self, values):
+        """Sum per-book-row values onto every individual author of the book."""
+        weights = np.repeat(values, np.diff(self.book_indptr))
+        return np.bincount(self.book_authors, weights=weights, minlength=len(self.names))
@@ -0,0 +1,184 @@
+"""Run the pipeline over many datasets on a process pool."""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .charts import ChartRenderer
+from .core import process
+from .load import ORDER_BATCH_SIZE
+from .profiler import NO_PROFILER, StageProfiler
+
+try:
+    import orjson
+except ImportError:  # optional: compact results are then written by json
+    orjson = None
+
+# pretty: indented JSON, daily_revenue as a list of {date, paid_price}
+# compact: the same without whitespace
+# columnar: compact, daily_revenue as {"date": [...], "paid_price": [...]}
+RESULTS_FORMATS = ["pretty", "compact", "columnar"]
+
+
+def results_path(dataset_dir, output_dir=None):
+    """Where a dataset's results go: <output_dir>/<name>_results.json.
+
+    Without output_dir this is next to the dataset directory, which is
+    where the dashboard looks for it.
+    """
+    dataset_dir = Path(dataset_dir)
+    output_dir = dataset_dir.parent if output_dir is None else Path(output_dir)
+    return output_dir / f"{dataset_dir.name}_results.json"
+
+
+def cube_path(dataset_dir, output_dir=None):
+    """The rollup cube goes next to the results: <name>_cube.parquet."""
+    results = results_path(dataset_dir, output_dir)
+    return results.with_name(f"{Path(dataset_dir).name}_cube.parquet")
+
+
+def profile_path(dataset_dir, output_dir=None):
+    """The stage profile goes next to the results: <name>_profile.json.
+
+    cProfile dumps, when asked for, go to the <name>_profile directory.
+    """
+    results = results_path(dataset_dir, output_dir)
+    return results.with_name(f"{Path(dataset_dir).name}_profile.json")
+
+
+def chart_path(dataset_dir):
+    return Path(dataset_dir) / "revenue_chart.png"
+
+
+def checkpoint_path(dataset_dir):
+    return Path(dataset_dir) / "pipeline_state.json"
+
+
+def check_dataset_names(dataset_dirs):
+    """Raise ValueError if two dataset directories share a name.
+
+    Output files and timings are keyed on the name, so a/DATA1 and
+    b/DATA1 would overwrite each other.
+    """
+    seen = set()
+    for d in dataset_dirs:
+        name = Path(d).name
+        if name in seen:
+            raise ValueError(f"more than one dataset directory is named {name!r}")
+        seen.add(name)
+
+
+def write_results(results, path, fmt="pretty"):
+    """Write results in one of RESULTS_FORMATS; the dashboard reads all."""
+    if fmt == "pretty":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        return
+
+    if fmt == "columnar":
+        daily = results["daily_revenue"]
+        results = {**results, "daily_revenue": {
+            "date": [row["date"] for row in daily],
+            "paid_price": [row["paid_price"] for row in daily],
+        }}
+    if orjson is not None:
+        data = orjson.dumps(results)
+    else:
+        data = json.dumps(results, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def run_dataset(dataset_dir, out_path, chart="background", verbose=False, incremental=False,
+                batch_size=ORDER_BATCH_SIZE, cache=None, profile=False, cprofile=False,
+                trace_memory=False, fuzzy_users=False, clean_workers=1, engine="pandas",
+                results_format="pretty", cube=False):
+    """Process one dataset and write its results; return the wall time.
+
+    chart is one of charts.CHART_MODES. In the background mode the chart
+    is drawn while the rest of the dataset is processed, and waited for
+    only after the results are written.
+
+    With profile, per-stage timings go to profile_path; cprofile and
+    trace_memory add cProfile dumps and tracemalloc peaks to it.
+    results_format is one of RESULTS_FORMATS. With cube, the rollup cube
+    goes to cube_path; its cells are held in memory (see process).
+    """
+    start = time.perf_counter()
+    out_dir = Path(out_path).parent
+    state_path = checkpoint_path(dataset_dir) if incremental else None
+    cube = cube_path(dataset_dir, out_dir) if cube else None
+    profiler = NO_PROFILER
+    if profile or cprofile or trace_memory:
+        prof_path = profile_path(dataset_dir, out_dir)
+        profiler = StageProfiler(
+            trace_memory=trace_memory,
+            cprofile_dir=prof_path.with_suffix("") if cprofile else None,
+        )
+
+    with ChartRenderer(background=chart == "background") as charts:
+        results = process(dataset_dir, chart=chart != "off", verbose=verbose,
+                          state_path=state_path, batch_size=batch_size, cache=cache,
+                          cube_path=cube, profiler=profiler,
+                          chart_path=chart_path(dataset_dir), charts=charts,
+                          fuzzy_users=fuzzy_users, clean_workers=clean_workers,
+                          engine=engine)
+        with profiler.stage("write results"):
+            write_results(results, out_path, results_format)
+        with profiler.stage("finish chart"):
+            charts.wait()
+
+    if profiler.enabled:
+        profiler.write(prof_path)
+    return time.perf_counter() - start
+
+
+def run_batch(dataset_dirs, workers=None, output_dir=None, chart="background", verbose=False,
+              incremental=False, batch_size=ORDER_BATCH_SIZE, cache=None, profile=False,
+              cprofile=False, trace_memory=False, fuzzy_users=False, clean_workers=1,
+              engine="pandas", results_format="pretty", cube=False):
+    """Process datasets in parallel, one per worker process.
+
+    Returns {dataset name: wall seconds}, in completion order. With a
+    single worker everything runs in this process, one dataset at a time.
+    With incremental, each dataset keeps an order checkpoint in its
+    directory (see checkpoint_path) and only new orders are processed.
+    A TableCache is shared by all workers. For the profiling options see
+    run_dataset. Dataset directories must have distinct names (see
+    check_dataset_names).
+    """
+    dataset_dirs = [Path(d) for d in dataset_dirs]
+    check_dataset_names(dataset_dirs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(dataset_dirs)))
+
+    if output_dir is not None:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    options = dict(
+        chart=chart, incremental=incremental, batch_size=batch_size, cache=cache,
+        profile=profile, cprofile=cprofile, trace_memory=trace_memory,
+        fuzzy_users=fuzzy_users, clean_workers=clean_workers, engine=engine,
+        results_format=results_format, cube=cube,
+    )
+    timings = {}
+    if workers == 1:
+        for d in dataset_dirs:
+            out = results_path(d, output_dir)
+            timings[d.name] = run_dataset(d, out, verbose=verbose, **options)
+            print(f"{d.name}: {timings[d.name]:.2f}s → {out}")
+        return timings
+
+    # Worker output would interleave, so per-dataset logging stays off
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_dataset, d, results_path(d, output_dir), verbose=False, **options): d
+            for d in dataset_dirs
+        }
+        for future in as_completed(futures):
+            d = futures[future]
+            timings[d.name] = future.result()
+            print(f"{d.name}: {timings[d.name]:.2f}s → {results_path(d, output_dir)}")
+    return timings
@@ -0,0 +1,130 @@
+"""Benchmark the pipeline on synthetic datasets of growing size.
+
+    python -m pipeline.bench --orders 10000 100000 1000000
+
+Datasets are generated once into the work directory (see synth) and
+reused by later runs. Every size is processed cold (no cache, no
+checkpoint) with the stage profiler on; a table of per-stage wall time
+is printed and everything is saved to <workdir>/bench.json.
+
+To check a change against the current implementation, benchmark the
+current code first with --output-dir, then the change with --reference
+pointing there: results must be identical.
+
+That only compares the pipeline with itself; pipeline.reference checks
+it against the original per-row algorithms.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from .batch import profile_path, results_path, run_dataset
+from .load import ORDER_BATCH_SIZE
+from .synth import generate
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_WORKDIR = Path("bench_data")
+
+
+def dataset_dir(workdir, orders, seed):
+    return Path(workdir) / f"synth_{orders}_s{seed}"
+
+
+def ensure_dataset(workdir, orders, seed):
+    """The synthetic dataset for this size and seed, generated if missing."""
+    d = dataset_dir(workdir, orders, seed)
+    if not (d / "orders.parquet").exists():
+        start = time.perf_counter()
+        generate(d, orders=orders, seed=seed)
+        print(f"Generated {d} in {time.perf_counter() - start:.1f}s")
+    return d
+
+
+def compare_results(path, reference_path):
+    """Names of result keys that differ from the reference, None if it is missing."""
+    try:
+        with open(reference_path, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+    except FileNotFoundError:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        actual = json.load(f)
+    return sorted(k for k in expected.keys() | actual.keys() if expected.get(k) != actual.get(k))
+
+
+def bench(sizes=DEFAULT_SIZES, workdir=DEFAULT_WORKDIR, output_dir=None, reference=None,
+          seed=0, batch_size=ORDER_BATCH_SIZE):
+    """Run every size and return {orders: summary}."""
+    workdir = Path(workdir)
+    output_dir = Path(output_dir) if output_dir is not None else workdir / "results"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    summary = {}
+    for orders in sizes:
+        d = ensure_dataset(workdir, orders, seed)
+        out = results_path(d, output_dir)
+        wall = run_dataset(d, out, chart="off", batch_size=batch_size, profile=True)
+        with open(profile_path(d, output_dir), "r", encoding="utf-8") as f:
+            profile = json.load(f)
+
+        entry = {
+            "wall_s": wall,
+            "orders_per_s": orders / wall,
+            "stages": {s["name"]: s["wall_s"] for s in profile["stages"]},
+            "peak_rss_bytes": max((s["process_rss_peak_bytes"] or 0) for s in profile["stages"]),
+        }
+        if reference is not None:
+            entry["differs"] = compare_results(out, results_path(d, reference))
+        summary[orders] = entry
+        print(f"{orders:>10,} orders: {wall:.2f}s ({entry['orders_per_s']:,.0f} orders/s)")
+
+    with open(workdir / "bench.json", "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in summary.items()}, f, indent=2)
+    return summary
+
+
+def print_table(summary):
+    sizes = list(summary)
+    stages = list(dict.fromkeys(s for v in summary.values() for s in v["stages"]))
+    width = max(len(s) for s in stages + ["peak RSS (MiB)"])
+    print(f"\n{'stage':<{width}}" + "".join(f"{n:>13,}" for n in sizes))
+    for stage in stages:
+        print(f"{stage:<{width}}" + "".join(f"{summary[n]['stages'].get(stage, 0):>12.3f}s" for n in sizes))
+    print(f"{'total':<{width}}" + "".join(f"{summary[n]['wall_s']:>12.3f}s" for n in sizes))
+    print(f"{'peak RSS (MiB)':<{width}}" + "".join(f"{summary[n]['peak_rss_bytes'] / 2**20:>13.0f}" for n in sizes))
+
+    checked = {n: v["differs"] for n, v in summary.items() if "differs" in v}
+    for n, differs in checked.items():
+        if differs is None:
+            print(f"{n:,} orders: no reference results")
+        elif differs:
+            print(f"{n:,} orders: DIFFERENT from reference in {', '.join(differs)}")
+        else:
+            print(f"{n:,} orders: identical to reference")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m pipeline.bench", description=__doc__.splitlines()[0])
+    ap.add_argument("--orders", type=int, nargs="+", default=DEFAULT_SIZES,
+                    help=f"dataset sizes in orders (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    ap.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR,
+                    help=f"where datasets and bench.json go (default: {DEFAULT_WORKDIR})")
+    ap.add_argument("-o", "--output-dir", type=Path, default=None,
+                    help="where results go (default: <workdir>/results)")
+    ap.add_argument("--reference", type=Path, default=None,
+                    help="results directory of a previous run to check results against")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--batch-size", type=int, default=ORDER_BATCH_SIZE)
+    args = ap.parse_args(argv)
+
+    summary = bench(args.orders, args.workdir, args.output_dir, args.reference,
+                    args.seed, args.batch_size)
+    print_table(summary)
+    differs = [v.get("differs") for v in summary.values()]
+    if any(differs):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""On-disk cache of cleaned tables, keyed by input content.
+
+Entries are parquet files named after a hash of the input files' bytes
+and CACHE_VERSION, so an edited input or a change in cleaning rules
+simply misses. The least recently used entries are deleted once the
+cache grows past its size limit.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump when the cleaning of users, books or orders changes: every entry
+# written before is then a miss.
+CACHE_VERSION = 6
+
+DEFAULT_CACHE_DIR = Path(".pipeline_cache")
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+META_KEY = b"pipeline"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TableCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def key(self, kind, *paths):
+        """Cache key for a table of the given kind cleaned from paths."""
+        h = hashlib.blake2b(f"{CACHE_VERSION}:{kind}".encode(), digest_size=16)
+        for path in paths:
+            h.update(file_digest(path).encode())
+        return f"{kind}-{h.hexdigest()}"
+
+    def path(self, key):
+        return self.root / f"{key}.parquet"
+
+    def get(self, key):
+        """The cached DataFrame, or None on a miss."""
+        path = self.path(key)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        self._touch(path)
+        return df
+
+    def put(self, key, df):
+        with self.writer(key) as w:
+            w.write(df)
+            w.commit()
+
+    def open_batches(self, key, batch_size, arrow=False):
+        """(metadata, DataFrame batches) of a streamed entry, or None on a miss.
+
+        With arrow the batches are pa.Tables instead.
+        """
+        path = self.path(key)
+        try:
+            pf = pq.ParquetFile(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        meta = json.loads((pf.metadata.metadata or {}).get(META_KEY, b"{}"))
+        self._touch(path)
+        batches = pf.iter_batches(batch_size=batch_size)
+        if arrow:
+            batches = (pa.Table.from_batches([b]) for b in batches)
+        else:
+            batches = (b.to_pandas() for b in batches)
+        return meta, batches
+
+    def writer(self, key):
+        """A TableWriter that appends DataFrames (or pa.Tables) to a new entry."""
+        return TableWriter(self, key)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for path in self.root.glob("*.parquet"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _touch(self, path):
+        # mtime is the last use, which eviction goes by
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+
+class TableWriter:
+    """Writes an entry batch by batch; it only appears in the cache on commit.
+
+    Use as a context manager. Leaving the block without commit() (e.g.
+    on an error) discards everything written.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache.path(key)
+        self.tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self.schema = None
+        self._writer = None
+
+    def write(self, df):
+        if not isinstance(df, pa.Table):
+            if self._writer is None and df.empty:
+                # An empty first batch would pin object columns to the null type
+                return
+            schema = self.schema if self._writer is not None else None
+            df = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if self._writer is None:
+            if df.num_rows == 0:
+                return
+            self.cache.root.mkdir(parents=True, exist_ok=True)
+            self.schema = df.schema
+            self._writer = pq.ParquetWriter(self.tmp, self.schema)
+        self._writer.write_table(df)
+
+    def commit(self, meta=None):
+        if self._writer is None:
+            return
+        if meta is not None:
+            self._writer.add_key_value_metadata({META_KEY: json.dumps(meta)})
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp, self.path)
+        self.cache.evict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self.tmp.unlink(missing_ok=True)
+        return False
+
+
+def cached_frame(cache, kind, path, load):
+    """load(path), going through cache when one is given.
+
+    Frames that do not fit a parquet table are returned uncached.
+    """
+    if cache is None:
+        return load(path)
+    key = cache.key(kind, path)
+    df = cache.get(key)
+    if df is None:
+        df = load(path)
+        try:
+            cache.put(key, df)
+        except pa.ArrowException:
+            # E.g. a column mixing strings and ints; TableWriter has
+            # already discarded the partial entry
+            pass
+    return df
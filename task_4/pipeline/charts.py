@@ -0,0 +1,67 @@
+"""Headless revenue chart rendering.
+
+Charts are drawn on Agg figures directly, without pyplot, so nothing
+depends on (or blocks in) an interactive backend and figures never
+share global state. A ChartRenderer can take rendering off the critical
+path onto a background thread.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# background: render on a thread while the pipeline goes on
+# inline: render before going on
+# off: no chart
+CHART_MODES = ["background", "inline", "off"]
+
+
+def plot_revenue(daily_sorted, name, path):
+    fig = Figure(figsize=(12, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(daily_sorted["date"], daily_sorted["paid_price"], linewidth=2, color="#667eea")
+    ax.set_title(f"Daily Revenue — {name}", fontsize=14, fontweight="bold")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Revenue (USD)")
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+
+
+class ChartRenderer:
+    """Renders charts inline or on one background thread.
+
+    Call wait() before relying on the files; it re-raises any rendering
+    error.
+    """
+
+    def __init__(self, background=True):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart") if background else None
+        self._pending = []
+
+    def submit(self, daily_sorted, name, path):
+        if self._pool is None:
+            plot_revenue(daily_sorted, name, path)
+        else:
+            self._pending.append(self._pool.submit(plot_revenue, daily_sorted.copy(), name, path))
+
+    def wait(self):
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,366 @@
+"""The per-dataset pipeline: load, clean, reconcile, aggregate, report."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from .aggregate import MONEY_SCALE, OrderAggregates
+from .authors import AuthorIndex
+from .cache import cached_frame
+from .charts import plot_revenue
+from .load import (
+    ORDER_BATCH_SIZE, clean_order_batch, clean_orders, clean_orders_arrow, iter_order_batches,
+    iter_orders, load_books, load_users, order_dtypes,
+)
+from .memory import MemoryReport
+from .profiler import NO_PROFILER
+from .reconcile import reconcile_users
+
+
+# Dimensions of the rollup cube, in sort order
+CUBE_DIMENSIONS = ["date", "author", "genre", "publisher", "user_group"]
+
+
+def process(dataset_dir, chart=True, verbose=True, state_path=None,
+            batch_size=ORDER_BATCH_SIZE, cache=None, cube_path=None, profiler=NO_PROFILER,
+            chart_path=None, charts=None, fuzzy_users=False, clean_workers=1,
+            engine="pandas"):
+    """Run the full pipeline on one dataset directory and return its results.
+
+    The directory must contain users.csv, books.yaml and orders.parquet.
+    The returned dict has the results.json schema the dashboard reads.
+
+    With state_path, order aggregates are checkpointed there and later
+    runs only fold in orders appended since (ids above the previous
+    maximum). Results are identical to a run without a checkpoint.
+
+    Orders are streamed batch_size rows at a time, so memory use does not
+    grow with the size of orders.parquet. With clean_workers > 1 the
+    batches are cleaned on that many worker processes; results are the
+    same as with in-process cleaning. engine (one of load.ENGINES) picks
+    pandas or Arrow for cleaning and folding the orders; both give the
+    same results.
+
+    With a TableCache, cleaned users, books and orders are reused from it
+    whenever the input files are unchanged.
+
+    With cube_path, the rollup cube (see rollup_cube) is written there as
+    parquet. Its cells are only tracked (and checkpointed) then, and they
+    are kept in memory: at day x book x user grain there is about one
+    per order, so peak memory then grows with orders.parquet.
+
+    Every numbered stage runs under profiler (a StageProfiler).
+
+    The revenue chart goes to chart_path (default: revenue_chart.png in
+    the dataset directory). It is rendered right away, or handed to
+    charts, a ChartRenderer, which may render it in the background.
+
+    With fuzzy_users, unique_users also merges near-duplicate users (see
+    reconcile_users); by default only exact field matches count.
+    """
+    dataset_dir = Path(dataset_dir)
+    name = dataset_dir.name
+    log = print if verbose else (lambda *args, **kwargs: None)
+    memory = MemoryReport()
+
+    log("=" * 60)
+    log(f"Processing {name}")
+    log("=" * 60)
+
+    # 1-2. Load users and books
+    with profiler.stage("load users") as rows:
+        df_users = cached_frame(cache, "users", dataset_dir / "users.csv", load_users)
+        rows.rows_out = len(df_users)
+    with profiler.stage("load books") as rows:
+        df_books = cached_frame(cache, "books", dataset_dir / "books.yaml", load_books)
+        authors = AuthorIndex(df_books["author"])
+        rows.rows_out = len(df_books)
+    memory.record("users", df_users)
+    memory.record("books", df_books)
+
+    # 3. Stream orders batch by batch, cleaning each batch and folding it
+    # into the running aggregates. With a checkpoint only orders above its
+    # high-water mark are cleaned.
+    orders_path = dataset_dir / "orders.parquet"
+    cells = cube_path is not None
+    aggregates = None
+    if state_path is not None:
+        with profiler.stage("load checkpoint"):
+            aggregates = OrderAggregates.load(state_path, cells=cells)
+    if aggregates is not None:
+        id_batches = (b["id"] for b in iter_orders(orders_path, batch_size, columns=["id"]))
+        with profiler.stage("check checkpoint"):
+            covered = aggregates.covers(id_batches)
+        if covered:
+            log(f"Checkpoint: {aggregates.seen_rows} orders already folded")
+        else:
+            log("Checkpoint does not match orders.parquet, rebuilding")
+            aggregates = None
+    if aggregates is None:
+        aggregates = OrderAggregates(cells=cells)
+
+    # Folding raises the mark and ids are not sorted in the file, so the
+    # mark to filter on is the one from before this run
+    mark = aggregates.max_order_id
+
+    # Only a full fold is cached: a checkpointed run cleans just the tail
+    orders_key = cache.key("orders", orders_path) if cache is not None and mark is None else None
+    cached = (
+        cache.open_batches(orders_key, batch_size, arrow=engine == "arrow")
+        if orders_key is not None else None
+    )
+    if cached is not None:
+        meta, batches = cached
+        for df_orders in profiler.iterate("read cached orders", batches):
+            memory.record("orders batch (clean)", df_orders)
+            with profiler.stage("aggregate orders", rows_in=len(df_orders)):
+                aggregates.fold(df_orders)
+        aggregates.max_order_id = meta["max_order_id"]
+        aggregates.seen_rows = meta["seen_rows"]
+        aggregates.seen_id_sum = meta["seen_id_sum"]
+        price_format_counts = meta["price_formats"]
+        new_rows = meta["seen_rows"]
+        log("Orders: cleaned table loaded from cache")
+    else:
+        price_format_counts, new_rows = fold_orders(
+            orders_path, aggregates, mark, batch_size, cache, orders_key, memory, profiler,
+            clean_workers, engine,
+        )
+
+    log(f"Orders processed: {new_rows}")
+    log(f"Price formats: {price_format_counts}")
+    if aggregates.rounded_rows:
+        # Shown even without verbose: the totals are not exact
+        print(f"Warning: {name}: {aggregates.rounded_rows} orders have prices finer than a cent; "
+              f"their revenue is rounded to the mill (0.001 USD)")
+    if state_path is not None:
+        with profiler.stage("save checkpoint"):
+            aggregates.save(state_path)
+
+    # 6. Daily revenue
+    with profiler.stage("daily revenue") as rows:
+        daily_sorted = aggregates.daily_revenue_frame()
+        daily_revenue = daily_sorted.sort_values("paid_price", ascending=False)
+
+        top5_days = daily_revenue.head(5)
+        top5_days_formatted = [str(d) for d in top5_days["date"]]
+        rows.rows_out = len(daily_sorted)
+
+    log("\nTop 5 days by revenue:")
+    for _, row in top5_days.iterrows():
+        log(f"  {row['date']}: ${row['paid_price']:,.2f}")
+
+    memory.record("daily revenue", daily_sorted)
+
+    # 7. User reconciliation
+    with profiler.stage("reconcile users", rows_in=len(df_users)) as rows:
+        groups = reconcile_users(df_users, fuzzy=fuzzy_users)
+        rows.rows_out = len(groups)
+    unique_users_count = len(groups)
+    log(f"\nUnique real users: {unique_users_count}")
+
+    # 8. Unique author sets
+    unique_author_sets = len(authors)
+    log(f"Unique author sets: {unique_author_sets}")
+
+    # 9. Most popular author
+    with profiler.stage("author sales", rows_in=len(df_books)) as rows:
+        book_qty = aggregates.book_quantity_series().reindex(df_books["id"]).to_numpy()
+        sales_by_author = quantity_by_author_set(authors, book_qty).sort_values(ascending=False)
+        # Each author of a set gets the set's sales
+        author_sales = authors.author_totals(np.nan_to_num(book_qty))
+        rows.rows_out = len(sales_by_author)
+
+    # None when no book has sold
+    top_author_display = ", ".join(sales_by_author.index[0]) if len(sales_by_author) else None
+    log(f"Most popular author: {top_author_display}")
+
+    # Ties go to the first name
+    top_single_author = (
+        authors.names[int(np.argmax(author_sales))] if author_sales.max(initial=0) > 0 else None
+    )
+    log(f"Most popular single author: {top_single_author}")
+
+    # 10. Best buyer
+    with profiler.stage("best buyer"):
+        user_spending = aggregates.user_spending_frame()
+        top_customer_id = int(user_spending.sort_values("paid_price", ascending=False).iloc[0]["user_id"])
+
+        top_group = next((g for g in groups if top_customer_id in g), [top_customer_id])
+        top_group = sorted(top_group)
+    log(f"Best buyer IDs: {top_group}")
+
+    # 11. Plot revenue
+    if chart:
+        chart_path = chart_path or dataset_dir / "revenue_chart.png"
+        with profiler.stage("plot revenue", rows_in=len(daily_sorted)):
+            if charts is None:
+                plot_revenue(daily_sorted, name, chart_path)
+            else:
+                charts.submit(daily_sorted, name, chart_path)
+        log(f"\nChart: {chart_path}")
+
+    # 12. Rollup cube
+    if cube_path is not None:
+        with profiler.stage("rollup cube") as rows:
+            cube = rollup_cube(aggregates.cells_frame(), df_books, authors, groups)
+            cube.to_parquet(cube_path, index=False)
+            rows.rows_out = len(cube)
+        memory.record("cube", cube)
+        log(f"Cube saved: {cube_path} ({len(cube)} rows)")
+
+    log("\nMemory (largest frame per stage):")
+    for line in memory.lines():
+        log(line)
+
+    # Whole columns at once; iterrows() would build a Series per row
+    daily_list = [
+        {"date": d, "paid_price": p}
+        for d, p in zip(
+            daily_sorted["date"].astype(str).tolist(),
+            daily_sorted["paid_price"].astype(float).tolist(),
+        )
+    ]
+
+    return {
+        "top_5_days": top5_days_formatted,
+        "unique_users": unique_users_count,
+        "unique_author_sets": unique_author_sets,
+        "most_popular_author": top_author_display,
+        "most_popular_single_author": top_single_author,
+        "best_buyer": top_group,
+        "daily_revenue": daily_list,
+    }
+
+
+def quantity_by_author_set(authors, book_qty):
+    """Quantity sold per author set, indexed by the set tuples in sorted order.
+
+    book_qty holds the quantity sold of every book row, NaN for books
+    without orders. Sets without sold books are left out, as in a
+    groupby over the books joined with their sales.
+    """
+    sold = ~np.isnan(book_qty)
+    totals = authors.set_totals(np.where(sold, book_qty, 0)).astype("int64")
+    has_sales = authors.set_totals(sold.astype(float)) > 0
+    index = pd.Index(authors.sets, dtype=object, tupleize_cols=False, name="author_tuple")
+    return pd.Series(totals, index=index, name="quantity")[has_sales]
+
+
+def rollup_cube(cells, df_books, authors, groups):
+    """Revenue (paid_price) and quantity by CUBE_DIMENSIONS, from
+    OrderAggregates.cells_frame().
+
+    author is the displayed author set and user_group the smallest id in
+    the reconciled group; buyers missing from users.csv are a group of
+    their own. Orders of unknown books keep empty book dimensions, so the
+    cube still adds up to the daily revenue.
+    """
+    group_of = {uid: min(g) for g in groups for uid in g}
+    books = df_books[["id", "genre", "publisher"]].assign(
+        author=authors.set_labels()[authors.book_set]
+    )
+    cube = cells.merge(books, left_on="book_id", right_on="id", how="left")
+    cube["user_group"] = cube["user_id"].map(group_of).fillna(cube["user_id"]).astype("int64")
+    cube = (
+        cube.groupby(CUBE_DIMENSIONS, dropna=False)[["paid_mills", "quantity"]]
+        .sum()
+        .reset_index()
+    )
+    cube["date"] = cube["date"].dt.date
+    cube.insert(len(CUBE_DIMENSIONS), "paid_price", cube.pop("paid_mills") / MONEY_SCALE)
+    return cube
+
+
+def fold_orders(orders_path, aggregates, mark, batch_size, cache=None, key=None,
+                memory=None, profiler=NO_PROFILER, workers=1, engine="pandas"):
+    """Clean and fold orders above mark; return (price format counts, rows).
+
+    With a cache key the cleaned batches are also written to the cache.
+    With a MemoryReport the raw and cleaned batch sizes are recorded.
+    With several workers batches are cleaned in parallel (see
+    clean_batches).
+    """
+    price_format_counts = {}
+    new_rows = 0
+    with cache.writer(key) if key is not None else nullcontext() as writer:
+        cleaned = clean_batches(orders_path, mark, batch_size, workers, memory, profiler, engine)
+        for raw_ids, df_orders, counts in cleaned:
+            if memory is not None:
+                memory.record("orders batch (clean)", df_orders)
+            with profiler.stage("aggregate orders", rows_in=len(df_orders)):
+                aggregates.fold(df_orders, raw_ids)
+            if writer is not None:
+                with profiler.stage("cache orders", rows_in=len(df_orders)):
+                    writer.write(df_orders)
+            for fmt, n in counts.items():
+                price_format_counts[fmt] = price_format_counts.get(fmt, 0) + n
+            new_rows += len(raw_ids)
+
+        if writer is not None:
+            writer.commit({
+                "max_order_id": aggregates.max_order_id,
+                "seen_rows": aggregates.seen_rows,
+                "seen_id_sum": aggregates.seen_id_sum,
+                "price_formats": price_format_counts,
+            })
+    return price_format_counts, new_rows
+
+
+def clean_batches(orders_path, mark, batch_size, workers=1, memory=None, profiler=NO_PROFILER,
+                  engine="pandas"):
+    """Yield (raw ids, cleaned orders, price format counts) per batch of
+    orders above mark, in file order.
+
+    Cleaned orders are DataFrames, or pa.Tables with the arrow engine.
+    With workers > 1 the batches are cleaned on a process pool, at most
+    two per worker in flight, and only the wait for each result is
+    profiled (as "clean orders"). Raw batches go to the workers as Arrow
+    buffers (see clean_order_batch). Every batch gets the same integer
+    dtypes, the narrowest the whole file needs (see order_dtypes).
+    """
+    dtypes = order_dtypes(orders_path)
+    if workers <= 1 and engine == "pandas":
+        for raw in profiler.iterate("read orders", iter_orders(orders_path, batch_size)):
+            if mark is not None:
+                raw = raw[raw["id"] > mark]
+            if raw.empty:
+                continue
+            if memory is not None:
+                memory.record("orders batch (raw)", raw)
+            yield (raw["id"], *clean_orders(raw, profiler, dtypes))
+        return
+
+    def raw_batches():
+        for raw in profiler.iterate("read orders", iter_order_batches(orders_path, batch_size)):
+            if mark is not None:
+                raw = raw.filter(pc.greater(raw["id"], mark))
+            if raw.num_rows:
+                yield raw["id"].to_numpy(zero_copy_only=False), raw
+
+    if workers <= 1:
+        for raw_ids, raw in raw_batches():
+            if memory is not None:
+                memory.record("orders batch (raw)", raw)
+            yield (raw_ids, *clean_orders_arrow(raw, profiler, dtypes))
+        return
+
+    def result(raw_ids, future):
+        with profiler.stage("clean orders", rows_in=len(raw_ids)) as rows:
+            df_orders, counts = future.result()
+            rows.rows_out = len(df_orders)
+        return raw_ids, df_orders, counts
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for raw_ids, raw in raw_batches():
+            pending.append((raw_ids, pool.submit(clean_order_batch, raw, engine, dtypes)))
+            # Fold what is ready while the pool is kept busy
+            while len(pending) >= 2 * workers or (pending and pending[0][1].done()):
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
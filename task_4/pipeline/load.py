@@ -0,0 +1,293 @@
+"""Loading and cleaning of the three dataset inputs."""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import yaml
+
+from .cache import file_digest
+from .prices import clean_price_array, clean_price_column
+from .profiler import NO_PROFILER
+from .timestamps import parse_timestamp_array, parse_timestamp_column
+
+EUR_TO_USD = 1.2
+
+USER_COLUMNS = ["id", "name", "address", "phone", "email"]
+
+# Only these order columns are ever read (shipping is not used)
+ORDER_COLUMNS = ["id", "user_id", "book_id", "quantity", "unit_price", "timestamp"]
+
+# Schema of cleaned orders. Ids and quantities are narrowed per file to
+# the smallest integer dtype their values need (see order_dtypes); these
+# are the widest. Prices stay float64 so money totals are unchanged. Date
+# parts (year, month, ...) are not stored: take them from date.dt on demand.
+CLEAN_ORDER_DTYPES = {
+    "id": "int64",
+    "user_id": "int64",
+    "book_id": "int64",
+    "quantity": "int64",
+    "unit_price": "float64",
+    "timestamp": "datetime64[us]",
+    "paid_price": "float64",
+    "date": "datetime64[us]",
+}
+INT_ORDER_COLUMNS = ["id", "user_id", "book_id", "quantity"]
+INT_DTYPES = ["int8", "int16", "int32", "int64"]
+
+# How orders are cleaned and aggregated:
+# pandas: as DataFrames
+# arrow: as Arrow tables, with pyarrow.compute kernels and group_by
+ENGINES = ["pandas", "arrow"]
+
+# Rows per streamed order batch; bounds peak memory whatever the file size
+ORDER_BATCH_SIZE = 65_536
+
+# libyaml's loader is several times faster; PyYAML may be built without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Bump when book cleaning changes so existing sidecars are rebuilt
+BOOKS_SIDECAR_VERSION = b"2"
+
+
+def load_users(path):
+    df_users = pd.read_csv(
+        path,
+        sep=",",
+        quotechar='"',
+        skipinitialspace=True
+    )
+
+    df_users.columns = USER_COLUMNS
+    df_users["id"] = df_users["id"].astype(int)
+    return df_users
+
+
+def books_sidecar_path(path):
+    return Path(path).with_suffix(".arrow")
+
+
+def load_books(path, sidecar=True):
+    """Read and clean books.yaml.
+
+    With sidecar, the cleaned table is also written next to it as an
+    Arrow file (books.arrow) that later calls memory-map instead of
+    parsing the YAML again, for as long as the YAML bytes are unchanged.
+    Books that do not fit an Arrow table are returned without a sidecar.
+    """
+    if not sidecar:
+        return parse_books(path)
+    digest = file_digest(path)
+    side = books_sidecar_path(path)
+    df_books = read_books_sidecar(side, digest)
+    if df_books is None:
+        df_books = parse_books(path)
+        write_books_sidecar(df_books, side, digest)
+    return df_books
+
+
+def read_books_sidecar(path, digest):
+    """The cleaned books in path if it was made from YAML with this digest."""
+    try:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    meta = table.schema.metadata or {}
+    if meta.get(b"source") != digest.encode() or meta.get(b"version") != BOOKS_SIDECAR_VERSION:
+        return None
+    return table.to_pandas()
+
+
+def write_books_sidecar(df_books, path, digest):
+    try:
+        table = pa.Table.from_pandas(df_books, preserve_index=False)
+    except pa.ArrowException:
+        # A column mixing types (an unquoted numeric title next to
+        # strings) has no Arrow type: such books are just not sidecar'd
+        return
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        b"source": digest.encode(),
+        b"version": BOOKS_SIDECAR_VERSION,
+    })
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    except OSError:
+        # A read-only dataset directory just means no sidecar
+        tmp.unlink(missing_ok=True)
+
+
+def parse_books(path):
+    with open(path, "r", encoding="utf-8") as f:
+        books = yaml.load(f, Loader=YAML_LOADER)
+
+    df_books = pd.DataFrame(books)
+
+    # Remove leading ":" in column names
+    df_books.rename(columns={c: c.lstrip(":") for c in df_books.columns}, inplace=True)
+
+    # Clean "year"
+    if "year" in df_books.columns:
+        df_books["year"] = (
+            df_books["year"]
+            .astype(str)
+            .str.strip()
+            .replace(["", "None", "NULL", "-", ".", "o", "O", "\t"], pd.NA)
+        )
+        df_books["year"] = pd.to_numeric(df_books["year"], errors="coerce")
+
+    # Authors are normalized by AuthorIndex
+    return df_books
+
+
+def iter_order_batches(path, batch_size=ORDER_BATCH_SIZE, columns=ORDER_COLUMNS):
+    """Yield raw orders as Arrow record batches of at most batch_size rows."""
+    pf = pq.ParquetFile(path)
+    yield from pf.iter_batches(batch_size=batch_size, columns=columns)
+
+
+def iter_orders(path, batch_size=ORDER_BATCH_SIZE, columns=ORDER_COLUMNS):
+    """Yield raw orders as DataFrames of at most batch_size rows."""
+    for batch in iter_order_batches(path, batch_size, columns):
+        yield batch.to_pandas()
+
+
+def narrowest_int_dtype(lo, hi):
+    """The smallest of INT_DTYPES that holds every value in [lo, hi]."""
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return INT_DTYPES[-1]
+
+
+def order_dtypes(path):
+    """CLEAN_ORDER_DTYPES for an orders file, integer columns narrowed to
+    fit their values.
+
+    The bounds come from the parquet column statistics, so every batch
+    of the file gets the same schema without a pass over the data.
+    Columns without statistics keep the widest dtype.
+    """
+    dtypes = dict(CLEAN_ORDER_DTYPES)
+    meta = pq.ParquetFile(path).metadata
+    columns = {meta.schema.column(j).path: j for j in range(meta.num_columns)}
+    for col in INT_ORDER_COLUMNS:
+        lo = hi = None
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(columns[col]).statistics
+            if stats is None or not stats.has_min_max:
+                lo = None
+                break
+            lo = stats.min if lo is None else min(lo, stats.min)
+            hi = stats.max if hi is None else max(hi, stats.max)
+        if lo is not None:
+            dtypes[col] = narrowest_int_dtype(lo, hi)
+    return dtypes
+
+
+def clean_order_schema(dtypes=CLEAN_ORDER_DTYPES):
+    """The pa.Schema of cleaned orders with these dtypes."""
+    return pa.schema([(col, pa.from_numpy_dtype(np.dtype(d))) for col, d in dtypes.items()])
+
+
+def clean_orders(df_orders, profiler=NO_PROFILER, dtypes=CLEAN_ORDER_DTYPES):
+    """Clean raw orders into dtypes (see order_dtypes); also return the
+    price format hit counts."""
+    df_orders = df_orders.copy()
+    with profiler.stage("clean prices", rows_in=len(df_orders)) as rows:
+        df_orders["unit_price"], price_format_counts = clean_price_column(df_orders["unit_price"])
+        rows.rows_out = int(df_orders["unit_price"].notna().sum())
+
+    with profiler.stage("clean timestamps", rows_in=len(df_orders)) as rows:
+        df_orders["timestamp"] = parse_timestamp_column(df_orders["timestamp"])
+
+        # Remove bad timestamps completely
+        df_orders = df_orders[df_orders["timestamp"].notna()].copy()
+        rows.rows_out = len(df_orders)
+
+    with profiler.stage("convert orders", rows_in=len(df_orders)) as rows:
+        # Convert types
+        for col in INT_ORDER_COLUMNS:
+            df_orders[col] = to_int_dtype(df_orders[col], dtypes[col])
+        df_orders["unit_price"] = df_orders["unit_price"].astype(float) * EUR_TO_USD
+
+        # paid_price
+        df_orders["paid_price"] = df_orders["quantity"] * df_orders["unit_price"]
+
+        # Day of the order
+        df_orders["date"] = df_orders["timestamp"].dt.floor("D")
+
+        df_orders = df_orders.astype(dtypes)[list(dtypes)]
+        rows.rows_out = len(df_orders)
+    return df_orders.reset_index(drop=True), price_format_counts
+
+
+def clean_orders_arrow(batch, profiler=NO_PROFILER, dtypes=CLEAN_ORDER_DTYPES):
+    """clean_orders for an Arrow batch of raw orders, without going
+    through pandas; returns a pa.Table with clean_order_schema(dtypes)."""
+    with profiler.stage("clean prices", rows_in=batch.num_rows) as rows:
+        unit_price, price_format_counts = clean_price_array(batch["unit_price"])
+        rows.rows_out = batch.num_rows - int(pc.sum(pc.is_nan(unit_price)).as_py() or 0)
+
+    with profiler.stage("clean timestamps", rows_in=batch.num_rows) as rows:
+        timestamp = parse_timestamp_array(batch["timestamp"])
+
+        # Remove bad timestamps completely
+        keep = pc.is_valid(timestamp)
+        timestamp = pc.filter(timestamp, keep)
+        rows.rows_out = len(timestamp)
+
+    with profiler.stage("convert orders", rows_in=len(timestamp)) as rows:
+        columns = {
+            col: to_int_array(pc.filter(batch[col], keep), col, dtypes[col])
+            for col in INT_ORDER_COLUMNS
+        }
+        columns["unit_price"] = pc.multiply(pc.filter(unit_price, keep), EUR_TO_USD)
+        columns["timestamp"] = timestamp
+        columns["paid_price"] = pc.multiply(
+            pc.cast(columns["quantity"], pa.float64()), columns["unit_price"]
+        )
+        columns["date"] = pc.floor_temporal(timestamp, unit="day")
+
+        schema = clean_order_schema(dtypes)
+        df_orders = pa.table(columns).select(schema.names).cast(schema)
+        rows.rows_out = df_orders.num_rows
+    return df_orders, price_format_counts
+
+
+def clean_order_batch(batch, engine="pandas", dtypes=CLEAN_ORDER_DTYPES):
+    """Clean an Arrow batch of raw orders with either engine; what
+    cleaning worker processes run.
+
+    Arrow batches cross process boundaries as their column buffers, so
+    the raw price and timestamp strings are never pickled one by one.
+    """
+    if engine == "arrow":
+        return clean_orders_arrow(batch, dtypes=dtypes)
+    return clean_orders(batch.to_pandas(), dtypes=dtypes)
+
+
+def to_int_dtype(values, dtype):
+    """values cast to a narrow integer dtype, refusing to wrap around
+    (which only bad parquet statistics could cause)."""
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        raise ValueError(f"{values.name} does not fit {dtype}, its parquet statistics are wrong")
+    return values.astype(dtype)
+
+
+def to_int_array(values, name, dtype):
+    """to_int_dtype for an Arrow array."""
+    info = np.iinfo(dtype)
+    bounds = pc.min_max(values)
+    if len(values) and (bounds["min"].as_py() < info.min or bounds["max"].as_py() > info.max):
+        raise ValueError(f"{name} does not fit {dtype}, its parquet statistics are wrong")
+    return values.cast(pa.from_numpy_dtype(np.dtype(dtype)))
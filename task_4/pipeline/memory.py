@@ -0,0 +1,48 @@
+"""Memory accounting for the frames a pipeline run holds."""
+import sys
+
+import pyarrow as pa
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def frame_bytes(df):
+    """Bytes held by a DataFrame, including the Python objects in it, or
+    by an Arrow table or record batch."""
+    if isinstance(df, (pa.Table, pa.RecordBatch)):
+        return int(df.nbytes)
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def mib(n):
+    return f"{n / 2**20:.1f} MiB"
+
+
+class MemoryReport:
+    """Largest frame seen per stage, in the order stages were first seen."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage, df):
+        self.stages[stage] = max(self.stages.get(stage, 0), frame_bytes(df))
+
+    def lines(self):
+        width = max((len(s) for s in self.stages), default=0)
+        lines = [f"  {stage:<{width}}  {mib(n):>10}" for stage, n in self.stages.items()]
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines.append(f"  {'peak RSS':<{width}}  {mib(peak):>10}")
+        return lines
@@ -0,0 +1,73 @@
+"""Order unit_price cleaning."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Dirty formats are tried in order, first match wins. Each pass is a
+# vectorized .str operation over the rows not yet matched.
+PRICE_FORMATS = [
+    # € Format: 1.234,56 or 12.000,00 (also catches 9,99)
+    ("eu_thousands", r"\d{1,3}(?:\.\d{3})*,\d{2}", [(".", ""), (",", ".")]),
+    # 12.000 → should be 12000.0
+    ("dot_thousands", r"\d+\.\d{3}", [(".", "")]),
+    # 9,99 → convert
+    ("decimal_comma", r"\d+,\d+", [(",", ".")]),
+]
+
+
+def clean_price_column(prices):
+    """Parse raw prices to floats; also return how many rows hit each format."""
+    v = prices.astype("string").str.strip()
+    out = pd.Series(float("nan"), index=prices.index)
+    pending = v.notna()
+    counts = {"missing": int((~pending).sum())}
+
+    for name, pattern, replacements in PRICE_FORMATS:
+        hit = pending & v.str.fullmatch(pattern).fillna(False).astype(bool)
+        cleaned = v[hit]
+        for old, new in replacements:
+            cleaned = cleaned.str.replace(old, new, regex=False)
+        out[hit] = cleaned.astype(float)
+        counts[name] = int(hit.sum())
+        pending &= ~hit
+
+    # Normal clean: drop currency symbols and other noise
+    cleaned = v[pending].str.replace(r"[^\d\.]", "", regex=True)
+    out[pending] = pd.to_numeric(cleaned.replace("", pd.NA), errors="coerce").astype(float)
+    counts["other"] = int(pending.sum())
+
+    return out, counts
+
+
+# What to_numeric reads from the digits and dots left by the normal clean
+PLAIN_NUMBER = r"^(?:\d+\.?\d*|\.\d+)$"
+
+
+def clean_price_array(prices):
+    """clean_price_column for an Arrow array, using pyarrow.compute
+    kernels. Unparsable prices are NaN (not null), as in pandas."""
+    v = pc.utf8_trim_whitespace(prices.cast(pa.string()))
+    out = np.full(len(v), np.nan)
+    pending = pc.is_valid(v).to_numpy(zero_copy_only=False)
+    counts = {"missing": int((~pending).sum())}
+
+    for name, pattern, replacements in PRICE_FORMATS:
+        match = pc.match_substring_regex(v, f"^(?:{pattern})$")
+        hit = pending & pc.fill_null(match, False).to_numpy(zero_copy_only=False)
+        cleaned = pc.filter(v, hit)
+        for old, new in replacements:
+            cleaned = pc.replace_substring(cleaned, old, new)
+        out[hit] = pc.cast(cleaned, pa.float64()).to_numpy(zero_copy_only=False)
+        counts[name] = int(hit.sum())
+        pending &= ~hit
+
+    # Normal clean: drop currency symbols and other noise
+    cleaned = pc.replace_substring_regex(pc.filter(v, pending), r"[^\d\.]", "")
+    number = pc.match_substring_regex(cleaned, PLAIN_NUMBER).to_numpy(zero_copy_only=False)
+    rest = np.full(len(cleaned), np.nan)
+    rest[number] = pc.cast(pc.filter(cleaned, number), pa.float64()).to_numpy(zero_copy_only=False)
+    out[pending] = rest
+    counts["other"] = int(pending.sum())
+
+    return pa.array(out), counts
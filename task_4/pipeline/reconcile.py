@@ -0,0 +1,175 @@
+"""User reconciliation: group user rows that belong to the same person."""
+import difflib
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Two users are the same person if they share at least one non-empty
+# normalized field. Each field gets a hash index (value -> first row) and
+# matches are merged with a union-find, so grouping is near-linear,
+# transitive and independent of iteration order.
+MATCH_FIELDS = ["name", "address", "phone", "email"]
+
+# Canonical forms on top of strip + lower: (pattern, replacement)
+FIELD_CANON = {
+    "phone": (r"\D", ""),              # digits only: (462) 385-4294 → 4623854294
+    "email": (r"\+[^@]*(?=@)", ""),    # no plus-tags: ann+books@x.test → ann@x.test
+}
+
+
+# Fuzzy mode: rows sharing a blocking key are candidates, and a candidate
+# pair is the same person if its mean field similarity reaches the
+# threshold. Blocks bigger than FUZZY_MAX_BLOCK are too unspecific to
+# be worth their quadratic cost and are skipped.
+FUZZY_THRESHOLD = 0.85
+FUZZY_MAX_BLOCK = 20
+
+# House number (after any apartment/suite prefix) and trailing ZIP code
+ADDRESS_KEY_RE = re.compile(r"^(?:(?:apt|suite)\.? \S+ )?(\d+) .*\b(\d{5})(?:-\d{4})?$")
+NAME_AFFIXES = {"mr", "mrs", "ms", "miss", "dr", "jr", "sr", "ii", "iii", "iv",
+                "v", "md", "phd", "dds", "dvm", "lld"}
+
+
+def normalize_users(df, fields=MATCH_FIELDS):
+    """Normalized match keys of every user, one string column per field.
+
+    Values are stripped and lowercased, then canonicalized per
+    FIELD_CANON. Missing values (and phones without digits) become "".
+    """
+    norms = {}
+    for field in fields:
+        values = df[field].astype("string").str.strip().str.lower()
+        if field in FIELD_CANON:
+            pattern, repl = FIELD_CANON[field]
+            values = values.str.replace(pattern, repl, regex=True)
+        norms[field] = values.fillna("")
+    return pd.DataFrame(norms, index=df.index)
+
+
+@lru_cache(maxsize=None)
+def soundex(word):
+    """American Soundex code of a word, "" if it has no letters."""
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+    codes = {c: str(d) for d, letters in enumerate(
+        ["aeiouy", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in letters}
+    out, last = word[0].upper(), codes.get(word[0])
+    for c in word[1:]:
+        code = codes.get(c)
+        if code is not None and code != "0" and code != last:
+            out += code
+        if c not in "hw":
+            last = code
+    return (out + "000")[:4]
+
+
+def blocking_keys(norms):
+    """Candidate blocks: one key column per blocking rule, "" for no key.
+
+    phone: last 10 digits; email: local part; name: Soundex of the first
+    and last names, titles and suffixes aside; address: house number and
+    ZIP code.
+    """
+    words = [
+        [w for w in name.replace(".", "").split() if w not in NAME_AFFIXES]
+        for name in norms["name"]
+    ]
+    return pd.DataFrame({
+        "phone": norms["phone"].str[-10:],
+        "email": norms["email"].str.split("@").str[0],
+        "name": [
+            f"{soundex(w[0])}{soundex(w[-1])}" if len(w) > 1 else "" for w in words
+        ],
+        "address": [
+            f"{m[1]} {m[2]}" if m else ""
+            for m in map(ADDRESS_KEY_RE.match, norms["address"])
+        ],
+    }, index=norms.index)
+
+
+def candidate_blocks(keys, max_size=FUZZY_MAX_BLOCK):
+    """Row positions per block of equal non-empty keys, for blocks of 2 to
+    max_size rows."""
+    codes, uniques = pd.factorize(keys)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    keep = (counts >= 2) & (counts <= max_size) & (uniques != "")
+    rows = np.flatnonzero(keep[codes] & (codes >= 0))
+    rows = rows[np.argsort(codes[rows], kind="stable")]
+    return np.split(rows, np.cumsum(counts[keep])[:-1])
+
+
+def similar(a, b, threshold):
+    """Whether the mean string similarity of two normalized users, over
+    the fields both have, reaches threshold."""
+    fields = [(x, y) for x, y in zip(a, b) if x and y]
+    if not fields:
+        return False
+    # Stop as soon as even perfect scores on the rest cannot make it
+    budget = len(fields) * (1 - threshold)
+    for x, y in fields:
+        matcher = difflib.SequenceMatcher(None, x, y, autojunk=False)
+        if matcher.real_quick_ratio() < 1 - budget or matcher.quick_ratio() < 1 - budget:
+            return False
+        budget -= 1 - matcher.ratio()
+        if budget < 0:
+            return False
+    return True
+
+
+def reconcile_users(df, fields=MATCH_FIELDS, fuzzy=False, threshold=FUZZY_THRESHOLD):
+    """Return groups of user ids, in order of each group's first row.
+
+    Rows sharing any normalized field are the same person. With fuzzy,
+    rows that share a blocking key (see blocking_keys) and are similar
+    enough overall are merged as well; the default exact mode is what
+    results.json reports. Blocking needs every one of MATCH_FIELDS, so
+    fuzzy mode takes no narrower fields.
+    """
+    missing = [f for f in MATCH_FIELDS if f not in fields]
+    if fuzzy and missing:
+        raise ValueError(f"fuzzy matching needs fields {MATCH_FIELDS}, missing {missing}")
+    parent = list(range(len(df)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        # The earliest row stays the root → deterministic group order
+        if ra < rb:
+            parent[rb] = ra
+        elif rb < ra:
+            parent[ra] = rb
+
+    norms = normalize_users(df, fields)
+    positions = np.arange(len(df))
+    for field in fields:
+        # Every row is joined to the first row with the same value
+        values = norms[field].to_numpy()
+        codes, _ = pd.factorize(values)
+        _, first_pos = np.unique(codes, return_index=True)
+        first = first_pos[codes]
+        for pos in np.flatnonzero((first != positions) & (values != "")):
+            union(int(first[pos]), int(pos))
+
+    if fuzzy:
+        rows = list(norms.itertuples(index=False, name=None))
+        for _, column in blocking_keys(norms).items():
+            for block in candidate_blocks(column.to_numpy()):
+                block = block.tolist()
+                for i, a in enumerate(block):
+                    for b in block[i + 1:]:
+                        if find(a) != find(b) and similar(rows[a], rows[b], threshold):
+                            union(a, b)
+
+    members = {}
+    for pos, user_id in enumerate(df["id"].tolist()):
+        members.setdefault(find(pos), []).append(int(user_id))
+
+    return list(members.values())
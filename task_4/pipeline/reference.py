@@ -0,0 +1,261 @@
+"""Check the pipeline against the original per-row algorithms.
+
+    python -m pipeline.reference DATA1 DATA2 DATA3
+
+The scripts the pipeline replaced cleaned one price and one timestamp
+per row and grouped users with a quadratic loop. Their functions are
+kept here as they were and run on every row of each dataset next to
+the vectorized versions:
+
+- prices: clean_price vs clean_price_column and clean_price_array
+- timestamps: clean_timestamp_strict vs parse_timestamp_column and
+  parse_timestamp_array, on every distinct raw string
+- users: the greedy reconciliation loop, made transitive, vs
+  reconcile_users, as a partition of user ids
+- checkpoint: a run that folds the first half of the orders and then
+  the rest from its checkpoint vs a single run, and the Arrow engine
+  vs pandas
+
+Exits with status 1 if anything differs. DATA1-3 have none of the
+comma prices and few of the timestamp layouts, so run it on a
+synthetic dataset (see synth) as well.
+"""
+import argparse
+import re
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .core import process
+from .load import load_users
+from .prices import clean_price_column, clean_price_array
+from .reconcile import FIELD_CANON, MATCH_FIELDS, reconcile_users
+from .timestamps import clean_timestamp_strict, parse_timestamp_array, parse_timestamp_column
+
+
+def clean_price(v):
+    if pd.isna(v):
+        return None
+
+    v = str(v).strip()
+
+    # € Format: 1.234,56 or 12.000,00 (also catches 9,99)
+    if re.match(r"^\d{1,3}(\.\d{3})*,\d{2}$", v):
+        v = v.replace(".", "").replace(",", ".")
+        return float(v)
+
+    # 12.000 → should be 12000.0
+    if re.match(r"^\d+\.\d{3}$", v):
+        v = v.replace(".", "")
+        return float(v)
+
+    # 9,99 → convert
+    if re.match(r"^\d+,\d+$", v):
+        return float(v.replace(",", "."))
+
+    # Normal clean
+    v = re.sub(r"[^\d\.]", "", v)
+    return float(v) if v else None
+
+
+def normalize_user(row):
+    return {
+        "name": str(row["name"]).strip().lower() if pd.notna(row["name"]) else "",
+        "address": str(row["address"]).strip().lower() if pd.notna(row["address"]) else "",
+        "phone": str(row["phone"]).strip().lower() if pd.notna(row["phone"]) else "",
+        "email": str(row["email"]).strip().lower() if pd.notna(row["email"]) else "",
+    }
+
+
+def canonical_norms(df_users):
+    """normalize_user of every row, then the FIELD_CANON forms one value at a time."""
+    norms = [normalize_user(row) for row in df_users.to_dict("records")]
+    for norm in norms:
+        for k, (pattern, repl) in FIELD_CANON.items():
+            norm[k] = re.sub(pattern, repl, norm[k])
+    return norms
+
+
+def greedy_groups(norms):
+    """The original reconciliation, as lists of row numbers: every row not
+    yet grouped takes all later ungrouped rows that share a non-empty
+    field with it.
+
+    Same groups as the original loop over df_users.loc, but the rows
+    sharing a value are looked up in a dict instead of compared one by one.
+    """
+    rows_by_value = {}
+    for j, norm in enumerate(norms):
+        for k in MATCH_FIELDS:
+            if norm[k] != "":
+                rows_by_value.setdefault((k, norm[k]), []).append(j)
+
+    groups = []
+    used = set()
+    for i, base in enumerate(norms):
+        if i in used:
+            continue
+        used.add(i)
+        matches = {j for k in MATCH_FIELDS if base[k] != ""
+                   for j in rows_by_value[(k, base[k])] if j not in used}
+        used |= matches
+        groups.append([i] + sorted(matches))
+    return groups
+
+
+def transitive_groups(norms, groups):
+    """Join groups that still share a non-empty field, until none do.
+
+    The original loop is not transitive (a row can match a later row of
+    another group), while reconcile_users is by design; on DATA1-3 this
+    joins nothing.
+    """
+    group_of = {i: g for g, rows in enumerate(groups) for i in rows}
+    neighbours = {g: set() for g in range(len(groups))}
+    first_group = {}
+    for i, norm in enumerate(norms):
+        for k in MATCH_FIELDS:
+            if norm[k] != "":
+                g = first_group.setdefault((k, norm[k]), group_of[i])
+                neighbours[g].add(group_of[i])
+                neighbours[group_of[i]].add(g)
+
+    joined, seen = [], set()
+    for start in range(len(groups)):
+        if start in seen:
+            continue
+        seen.add(start)
+        component, stack = [], [start]
+        while stack:
+            g = stack.pop()
+            component.extend(groups[g])
+            for n in neighbours[g] - seen:
+                seen.add(n)
+                stack.append(n)
+        joined.append(component)
+    return joined
+
+
+def count_unequal(got, expected):
+    """Positions where two arrays differ; NaN and NaT equal themselves."""
+    return int(((got != expected) & ~(pd.isna(got) & pd.isna(expected))).sum())
+
+
+def partition(groups):
+    return {frozenset(g) for g in groups}
+
+
+def count_price_mismatches(prices):
+    """Rows where the vectorized price cleaners disagree with clean_price."""
+    def reference(v):
+        # The original raised on leftovers like "1.2.3"; the pipeline
+        # treats them as unparsable
+        try:
+            p = clean_price(v)
+        except ValueError:
+            return np.nan
+        return np.nan if p is None else p
+
+    expected = np.array([reference(v) for v in prices], dtype=float)
+    column, _ = clean_price_column(pd.Series(prices, dtype=object))
+    array, _ = clean_price_array(pa.array(prices, type=pa.string()))
+    return sum(count_unequal(got, expected)
+               for got in (column.to_numpy(dtype=float), array.to_numpy(zero_copy_only=False)))
+
+
+def count_timestamp_mismatches(values):
+    """Distinct strings the fast timestamp parsers read differently from
+    clean_timestamp_strict."""
+    uniques = pd.Series(pd.unique(pd.Series(values, dtype=object).dropna()), dtype=object)
+    expected = pd.to_datetime(
+        pd.Series([clean_timestamp_strict(v) for v in uniques], dtype=object)
+    ).to_numpy("datetime64[us]")
+    column = parse_timestamp_column(uniques).to_numpy("datetime64[us]")
+    array = parse_timestamp_array(pa.array(uniques, type=pa.string()))
+    array = array.to_numpy(zero_copy_only=False).astype("datetime64[us]")
+    return sum(count_unequal(got, expected) for got in (column, array)), len(uniques)
+
+
+def count_result_mismatches(expected, actual):
+    return sorted(k for k in expected.keys() | actual.keys() if expected.get(k) != actual.get(k))
+
+
+def checkpoint_results(dataset_dir):
+    """Results of a run over the orders up to the median id, continued
+    from its checkpoint once the rest of the orders are there."""
+    orders = pq.read_table(dataset_dir / "orders.parquet")
+    ids = orders["id"].to_numpy()
+    first = orders.filter(pa.array(ids <= np.median(ids)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = Path(tmp) / dataset_dir.name
+        d.mkdir()
+        for name in ("users.csv", "books.yaml"):
+            shutil.copy(dataset_dir / name, d / name)
+        state = d / "pipeline_state.json"
+        pq.write_table(first, d / "orders.parquet")
+        process(d, chart=False, verbose=False, state_path=state)
+        shutil.copy(dataset_dir / "orders.parquet", d / "orders.parquet")
+        return process(d, chart=False, verbose=False, state_path=state)
+
+
+def check_dataset(dataset_dir):
+    """Print one line per check; return how many checks failed."""
+    dataset_dir = Path(dataset_dir)
+    failed = 0
+
+    def report(check, mismatches, total, unit):
+        nonlocal failed
+        if mismatches:
+            failed += 1
+            print(f"  {check}: {mismatches} of {total:,} {unit} DIFFER")
+        else:
+            print(f"  {check}: ok ({total:,} {unit})")
+
+    print(dataset_dir.name)
+    raw = pq.read_table(dataset_dir / "orders.parquet", columns=["unit_price", "timestamp"])
+
+    prices = raw["unit_price"].to_pylist()
+    report("prices", count_price_mismatches(prices), len(prices), "rows")
+
+    mismatches, total = count_timestamp_mismatches(raw["timestamp"].to_pylist())
+    report("timestamps", mismatches, total, "distinct strings")
+
+    df_users = load_users(dataset_dir / "users.csv")
+    norms = canonical_norms(df_users)
+    ids = df_users["id"].astype(int).tolist()
+    greedy = greedy_groups(norms)
+    expected = partition([ids[i] for i in rows] for rows in transitive_groups(norms, greedy))
+    actual = partition(reconcile_users(df_users))
+    report("users", len(expected ^ actual), len(expected), "groups")
+    if len(greedy) != len(expected):
+        print(f"    ({len(greedy) - len(expected)} groups of the original loop joined by transitivity)")
+
+    full = process(dataset_dir, chart=False, verbose=False)
+    differs = count_result_mismatches(full, checkpoint_results(dataset_dir))
+    report("checkpoint", len(differs), len(full), "result keys")
+    differs = count_result_mismatches(full, process(dataset_dir, chart=False, verbose=False, engine="arrow"))
+    report("arrow engine", len(differs), len(full), "result keys")
+
+    return failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m pipeline.reference", description=__doc__.splitlines()[0])
+    ap.add_argument("datasets", nargs="+", type=Path, help="dataset directories to check")
+    args = ap.parse_args(argv)
+
+    failed = sum(check_dataset(d) for d in args.datasets)
+    if failed:
+        print(f"{failed} checks failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Synthetic datasets in the same dirty formats as DATA1-3, at any size.
+
+    python -m pipeline.synth OUT_DIR --orders 1000000
+
+writes OUT_DIR/users.csv, books.yaml and orders.parquet. The data has
+what the pipeline has to cope with: prices in $/USD/EUR/€ spellings
+with ¢ and comma decimals, timestamps in dozens of layouts (some of
+which are rejected), users duplicated with some fields changed, books
+with several authors and junk years, and orders of unknown books.
+Output is deterministic for a given seed.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SYLLABLES = [
+    "ka", "lo", "mi", "ren", "sa", "to", "vel", "an", "bre", "cor", "da", "el",
+    "fa", "gin", "ha", "is", "jo", "ke", "lin", "mar", "no", "or", "pe", "qui",
+    "ro", "sel", "tan", "ur", "vi", "wen", "xa", "yo", "zel", "ber", "cha", "dor",
+]
+NAME_PREFIXES = ["", "", "", "", "", "", "Dr. ", "Mr. ", "Ms. ", "Rep. "]
+NAME_SUFFIXES = ["", "", "", "", "", "", " II", " Jr.", " Sr.", " MD"]
+STREET_TYPES = ["Street", "Keys", "Wells", "Ferry", "Rapids", "Valley", "Plaza", "Walk", "Fields"]
+STATES = ["AL", "CA", "CO", "FL", "IA", "ID", "IL", "KS", "ME", "NC", "NE", "OK", "TX", "VA", "WV"]
+DOMAINS = ["example", "test"]
+PHONE_FORMATS = ["{a}.{b}.{c}", "{a}-{b}-{c}", "{a} {b} {c}", "({a}) {b}-{c}"]
+
+GENRES = ["Classic", "Short story", "Biography/Autobiography", "Mythology", "Reference book",
+          "Crime/Detective", "Historical fiction", "Fantasy", "Poetry", "Science fiction"]
+PUBLISHERS = ["Mainstream Publishing", "Vintage Books", "Pavilion Books", "Orion Books",
+              "Hodder & Stoughton", "Penguin Books", "Tor Books", "Faber and Faber"]
+JUNK_YEARS = ["NULL", "-", "", "\t", None, ".", "o", 9]
+# How many authors a book has, roughly as in DATA1-3
+AUTHOR_COUNTS = [1, 2, 3, 4, 5, 6]
+AUTHOR_COUNT_P = [0.70, 0.18, 0.09, 0.02, 0.005, 0.005]
+
+# {n} is the amount with a dot, {w}/{f} its whole and fraction parts
+PRICE_TEMPLATES = [
+    "${n}", "{n} USD", "{n} $", "$ {n}", "USD {n}", "{n}$", "USD{n}", "{n}USD",
+    "${w}¢{f}", "€{w}¢{f}", "{w}€{f}¢", "EUR {n}", "{n}€", "{n} €", "EUR{n}",
+    "{n}EUR", "{n} EUR", "€{n}", "{w},{f}", "{w},{f} €",
+]
+QUANTITIES = [1, 2, 3, 4, 5, 6, 8, 10]
+QUANTITY_P = [0.70, 0.16, 0.065, 0.034, 0.033, 0.004, 0.002, 0.002]
+
+# strftime layouts; _AM marks layouts whose AM/PM is spelled A.M./P.M.
+TIMESTAMP_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%d.%m.%Y %H:%M:%S", "%Y-%m-%d, %H:%M",
+    "%m/%d/%y, %H:%M", "%H:%M %m/%d/%y", "%H:%M, %m/%d/%y", "%H:%M:%S %m/%d/%y",
+    "%H:%M:%S,%Y-%m-%d", "%m/%d/%y, %H:%M:%S", "%Y-%m-%d,%H:%M:%S", "%H:%M;%m/%d/%y",
+    "%Y-%m-%d %H:%M:%S", "%m/%d/%y;%H:%M:%S", "%H:%M:%S;%Y-%m-%d", "%d-%b-%Y %H:%M:%S",
+    "%d-%b-%Y,%I:%M:%S %p", "%I:%M:%S %p,%Y-%m-%d", "%I:%M:%S %p %m/%d/%y_AM",
+    "%m/%d/%y;%I:%M:%S %p_AM", "%H:%M;%d-%b-%Y", "%I:%M:%S %p, %d-%b-%Y_AM",
+    "%Y-%m-%d,%I:%M:%S %p", "%H:%M:%S, %d-%b-%Y",
+]
+JUNK_TIMESTAMPS = ["", "N/A", "unknown", "31/31/31 31:31", "2024-13-45T25:61:00"]
+FIRST_DAY = pd.Timestamp("2024-01-01")
+LAST_DAY = pd.Timestamp("2025-07-31")
+
+DUPLICATE_SHARE = 0.08
+UNKNOWN_BOOK_SHARE = 0.005
+ORDER_CHUNK = 1_000_000
+
+
+def generate(out_dir, orders=10_000, users=None, books=None, seed=0):
+    """Write a dataset with the given number of orders into out_dir.
+
+    Users and books default to the proportions of DATA1-3.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    users = users or max(100, orders // 3)
+    books = books or min(100_000, max(50, orders // 15))
+    rng = np.random.default_rng(seed)
+
+    user_ids = write_users(out_dir / "users.csv", users, rng)
+    book_ids = write_books(out_dir / "books.yaml", books, rng)
+    write_orders(out_dir / "orders.parquet", orders, user_ids, book_ids, rng)
+    return out_dir
+
+
+# ---- users -------------------------------------------------------------
+
+def _words(rng, n, lo=2, hi=3):
+    counts = rng.integers(lo, hi + 1, size=n)
+    picks = rng.integers(0, len(SYLLABLES), size=counts.sum())
+    words, start = [], 0
+    for c in counts:
+        words.append("".join(SYLLABLES[i] for i in picks[start:start + c]).capitalize())
+        start += c
+    return words
+
+
+def _people(rng, n):
+    first, last = _words(rng, n), _words(rng, n, 2, 4)
+    prefix = rng.choice(NAME_PREFIXES, size=n)
+    suffix = rng.choice(NAME_SUFFIXES, size=n)
+    return first, last, [f"{p}{f} {l}{s}" for p, f, l, s in zip(prefix, first, last, suffix)]
+
+
+def _addresses(rng, n):
+    number = rng.integers(1, 99_999, size=n)
+    street, city = _words(rng, n), _words(rng, n)
+    kind = rng.choice(STREET_TYPES, size=n)
+    state = rng.choice(STATES, size=n)
+    zip_code = rng.integers(0, 99_999, size=n)
+    apt = rng.integers(100, 999, size=n)
+    has_apt = rng.random(n) < 0.4
+    return [
+        f"{'Apt. %d ' % a if h else ''}{num} {s} {k}, {c}, {st} {z:05d}"
+        for a, h, num, s, k, c, st, z in zip(apt, has_apt, number, street, kind, city, state, zip_code)
+    ]
+
+
+def _phones(rng, n):
+    digits = rng.integers(0, 10, size=(n, 10))
+    fmt = rng.integers(0, len(PHONE_FORMATS), size=n)
+    return [
+        PHONE_FORMATS[f].format(a="".join(map(str, d[:3])), b="".join(map(str, d[3:6])),
+                                c="".join(map(str, d[6:])))
+        for f, d in zip(fmt, digits)
+    ]
+
+
+def write_users(path, n, rng):
+    """users.csv with n rows, DUPLICATE_SHARE of them copies of an earlier
+    user where some fields match (after case/space changes) and the
+    others differ. Returns the user ids."""
+    n_dup = int(n * DUPLICATE_SHARE)
+    n_new = n - n_dup
+    first, last, names = _people(rng, n_new)
+    emails = [
+        f"{f.lower()}.{l.lower()}@{d.lower()}.{t}"
+        for f, l, d, t in zip(first, last, _words(rng, n_new), rng.choice(DOMAINS, size=n_new))
+    ]
+    df = pd.DataFrame({
+        "name": names,
+        "address": _addresses(rng, n_new),
+        "phone": _phones(rng, n_new),
+        "email": emails,
+    })
+
+    dup = df.iloc[rng.integers(0, n_new, size=n_dup)].reset_index(drop=True)
+    _, _, fresh_names = _people(rng, n_dup)
+    fresh = pd.DataFrame({
+        "name": fresh_names,
+        "address": _addresses(rng, n_dup),
+        "phone": _phones(rng, n_dup),
+        "email": [f"{w}@{d}.test".lower() for w, d in zip(_words(rng, n_dup), _words(rng, n_dup))],
+    })
+    # Each copy keeps at least one of the original fields
+    keep = rng.random((n_dup, 4)) < 0.4
+    keep[np.arange(n_dup), rng.integers(0, 4, size=n_dup)] = True
+    for i, col in enumerate(df.columns):
+        dup[col] = np.where(keep[:, i], dup[col], fresh[col])
+    dup["name"] = np.where(rng.random(n_dup) < 0.3, dup["name"].str.upper(), dup["name"])
+    dup["email"] = np.where(rng.random(n_dup) < 0.3, " " + dup["email"] + " ", dup["email"])
+
+    df = pd.concat([df, dup], ignore_index=True).sample(frac=1, random_state=rng)
+    df.insert(0, "id", 44_000 + rng.permutation(len(df)))
+    df.to_csv(path, index=False)
+    return df["id"].to_numpy()
+
+
+# ---- books -------------------------------------------------------------
+
+def write_books(path, n, rng):
+    """books.yaml with n books, keys spelled :id:, :author: and so on.
+    Returns the book ids."""
+    _, _, pool = _people(rng, max(10, n // 2))
+    counts = rng.choice(AUTHOR_COUNTS, size=n, p=AUTHOR_COUNT_P)
+    picks = rng.integers(0, len(pool), size=counts.sum())
+    authors, start = [], 0
+    for c in counts:
+        authors.append(", ".join(pool[i] for i in picks[start:start + c]))
+        start += c
+
+    ids = 18_000 + rng.permutation(n * 2)[:n]
+    titles = [f"The {a} of {b}" for a, b in zip(_words(rng, n), _words(rng, n))]
+    genres = rng.choice(GENRES, size=n)
+    publishers = rng.choice(PUBLISHERS, size=n)
+    years = rng.integers(1800, 2025, size=n).tolist()
+    junk = rng.random(n) < 0.02
+    for i in np.flatnonzero(junk):
+        years[i] = JUNK_YEARS[rng.integers(0, len(JUNK_YEARS))]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("---\n")
+        for row in zip(ids, titles, authors, genres, publishers, years):
+            book_id, title, author, genre, publisher, year = row
+            # JSON strings are valid YAML double-quoted scalars
+            f.write(
+                f"- :id: {book_id}\n"
+                f"  :title: {json.dumps(title)}\n"
+                f"  :author: {json.dumps(author)}\n"
+                f"  :genre: {json.dumps(str(genre))}\n"
+                f"  :publisher: {json.dumps(str(publisher))}\n"
+                f"  :year: {'~' if year is None else json.dumps(year)}\n"
+            )
+    return ids
+
+
+# ---- orders ------------------------------------------------------------
+
+def _prices(rng, n):
+    whole = rng.integers(10, 76, size=n)
+    cents = rng.choice([0, 25, 50, 75, 99], size=n)
+    templates = rng.integers(0, len(PRICE_TEMPLATES), size=n)
+    short = rng.random(n) < 0.1   # 47.5 / 47. / 47 instead of 47.50
+    out = []
+    for w, c, t, s in zip(whole, cents, templates, short):
+        f = f"{c:02d}"
+        n_str = f"{w}.{f}"
+        if s:
+            n_str = f"{w}.{f.rstrip('0')}" if c else (f"{w}." if w % 2 else str(w))
+        out.append(PRICE_TEMPLATES[t].format(n=n_str, w=w, f=f))
+    out = np.array(out, dtype=object)
+    out[rng.random(n) < 0.01] = None
+    return out
+
+
+def _timestamps(rng, n):
+    span = int((LAST_DAY - FIRST_DAY).total_seconds())
+    ts = pd.Series(FIRST_DAY + pd.to_timedelta(rng.integers(0, span, size=n), unit="s"))
+    ts += pd.to_timedelta(rng.integers(0, 1000, size=n), unit="ms")
+    layout = rng.integers(0, len(TIMESTAMP_FORMATS), size=n)
+    out = np.empty(n, dtype=object)
+    for i, fmt in enumerate(TIMESTAMP_FORMATS):
+        rows = layout == i
+        if not rows.any():
+            continue
+        spelled = fmt.endswith("_AM")
+        text = ts[rows].dt.strftime(fmt.removesuffix("_AM"))
+        if "%f" in fmt:
+            text = text.str[:-3]
+        if "%b" in fmt and i % 2:
+            text = text.str.upper()
+        if spelled:
+            text = text.str.replace("AM", "A.M.").str.replace("PM", "P.M.")
+        out[rows] = text.to_numpy()
+    junk = rng.random(n) < 0.02
+    out[junk] = rng.choice(JUNK_TIMESTAMPS, size=int(junk.sum()))
+    return out
+
+
+def write_orders(path, n, user_ids, book_ids, rng):
+    """orders.parquet with n orders in chunks of ORDER_CHUNK rows."""
+    order_ids = 60_000 + rng.permutation(n)
+    shipping_pool = np.array(_addresses(rng, 1_000) + [None, "NULL", ""], dtype=object)
+    schema = pa.schema([
+        ("id", pa.int64()), ("user_id", pa.int64()), ("book_id", pa.int64()),
+        ("quantity", pa.int32()), ("unit_price", pa.string()), ("timestamp", pa.string()),
+        ("shipping", pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, n, ORDER_CHUNK):
+            m = min(ORDER_CHUNK, n - start)
+            books = rng.choice(book_ids, size=m)
+            unknown = rng.random(m) < UNKNOWN_BOOK_SHARE
+            books[unknown] = 1 + rng.integers(0, 1_000, size=int(unknown.sum()))
+            chunk = pa.table({
+                "id": order_ids[start:start + m],
+                "user_id": rng.choice(user_ids, size=m),
+                "book_id": books,
+                "quantity": rng.choice(QUANTITIES, size=m, p=QUANTITY_P).astype(np.int32),
+                "unit_price": _prices(rng, m),
+                "timestamp": _timestamps(rng, m),
+                "shipping": rng.choice(shipping_pool, size=m),
+            }, schema=schema)
+            writer.write_table(chunk)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m pipeline.synth", description=__doc__.splitlines()[0])
+    ap.add_argument("out_dir", type=Path)
+    ap.add_argument("--orders", type=int, default=10_000)
+    ap.add_argument("--users", type=int, default=None, help="default: orders / 3")
+    ap.add_argument("--books", type=int, default=None, help="default: orders / 15, at most 100000")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    generate(args.out_dir, args.orders, args.users, args.books, args.seed)
+    print(f"Wrote {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
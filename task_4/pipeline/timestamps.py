@@ -0,0 +1,216 @@
+"""Order timestamp cleaning.
+
+Raw timestamps come in dozens of layouts. Distinct strings are grouped by
+a structural fingerprint and parsed with vectorized formats; anything the
+formats cannot reproduce goes through the strict fuzzy dateutil parser.
+"""
+import datetime as dt
+import re
+import time
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dateutil import parser
+
+# Fuzzy parsing reads stray letters as tz names; those values are
+# rejected anyway, the warning is noise
+warnings.filterwarnings("ignore", category=parser.UnknownTimezoneWarning)
+
+# Две разные даты по умолчанию: если результат разбора от них зависит,
+# значит год, месяц или день парсер подставил сам (раньше это ловилось
+# сравнением с today и зависело от дня запуска)
+TS_DEFAULTS = (dt.datetime(2000, 1, 1), dt.datetime(2001, 2, 2))
+
+
+def clean_timestamp_strict(value):
+    # 1. Пустое → повреждённое, сразу None
+    if pd.isna(value) or str(value).strip() == "":
+        return None
+
+    # 2. Превращаем в строку
+    v = str(value)
+
+    try:
+        # 3. Разбираем строку с обеими датами по умолчанию
+        ts = parser.parse(v, fuzzy=True, default=TS_DEFAULTS[0])
+        alt = parser.parse(v, fuzzy=True, default=TS_DEFAULTS[1])
+
+        # 4. Дата зависит от default → часть даты была подставлена
+        if ts.date() != alt.date():
+            # → это повреждённый timestamp
+            return None
+
+        # 5. Если дата валидная → возвращаем её
+        return ts
+
+    except:
+        # 6. Любая ошибка = повреждённая дата → None
+        return None
+
+
+# Per-row fuzzy parsing is slow, so distinct raw strings are grouped by a
+# structural fingerprint (digits → 9, AM/PM → P, month names → M/W) and
+# every fingerprint that maps onto known tokens is parsed with vectorized
+# pd.to_datetime(format=...). Ambiguous day/month orders list the
+# month-first reading first, like dateutil does.
+TS_TOKENS = [
+    (r"9999-99-99", ["%Y-%m-%d"]),
+    (r"99?/99?/99", ["%m/%d/%y", "%d/%m/%y"]),
+    (r"99?\.99?\.9999", ["%m.%d.%Y", "%d.%m.%Y"]),
+    (r"99?-M-9999", ["%d-%b-%Y"]),
+    (r"99?-W-9999", ["%d-%B-%Y"]),
+    (r"M M 99?", ["%a %b %d"]),
+    (r"99?:99:99\.9+", ["%H:%M:%S.%f"]),
+    (r"99?:99:99 P", ["%I:%M:%S %p"]),
+    (r"99?:99 P", ["%I:%M %p"]),
+    (r"99?:99:99", ["%H:%M:%S"]),
+    (r"99?:99", ["%H:%M"]),
+    (r"9999", ["%Y"]),
+]
+TS_TOKEN_RE = re.compile("|".join(f"({p})" for p, _ in TS_TOKENS))
+TS_SEPARATORS = set(" ,;T")
+
+# As a guard, a fingerprint's formats are only used in a call if they
+# reproduce the scalar parser on that call's first few values of it;
+# otherwise the fingerprint goes through the scalar parser. The verdict
+# is not kept across calls, so one dataset never decides for another.
+TS_SAMPLE_SIZE = 8
+
+
+def ts_normalize(values):
+    v = values.str.strip().str.replace(r"\s+", " ", regex=True)
+    # A.M./P.M. → AM/PM so that %p can read them
+    return v.str.replace(r"\b([AaPp])\.?([Mm])\.?(?=\W|$)", r"\1\2", regex=True)
+
+
+def ts_fingerprint(values):
+    fp = values.str.replace(r"\d", "9", regex=True)
+    fp = fp.str.replace(r"\b[AaPp][Mm]\b", "P", regex=True)
+    fp = fp.str.replace(r"\b[A-Za-z]{3}\b", "M", regex=True)
+    return fp.str.replace(r"[A-Za-z]{4,}", "W", regex=True)
+
+
+@lru_cache(maxsize=None)
+def ts_formats(fp):
+    # dateutil reads a comma between digits as a decimal mark
+    # ("08:50:39,2024-06-06") and the strict parser rejects such values;
+    # the formats would accept them, so they go to the scalar parser
+    if "9,9" in fp:
+        return None
+
+    formats = [""]
+    pos = 0
+    for m in TS_TOKEN_RE.finditer(fp):
+        gap = fp[pos:m.start()]
+        if not set(gap) <= TS_SEPARATORS:
+            return None
+        options = TS_TOKENS[m.lastindex - 1][1]
+        formats = [f + gap + o for f in formats for o in options]
+        pos = m.end()
+
+    if pos == 0 or not set(fp[pos:]) <= TS_SEPARATORS:
+        return None
+
+    # No year, month or day token → the date would be filled in, reject
+    # the whole fingerprint without parsing it
+    if not all(ts_has_date(f) for f in formats):
+        return []
+    return formats
+
+
+def ts_has_date(fmt):
+    return all(
+        any(d in fmt for d in directives)
+        for directives in (("%Y", "%y"), ("%m", "%b", "%B"), ("%d",))
+    )
+
+
+def ts_cascade(values, formats):
+    out = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[us]")
+    todo = np.arange(len(values))
+    for fmt in formats:
+        parsed = pd.to_datetime(values[todo], format=fmt, errors="coerce")
+        if "%y" in fmt:
+            parsed = ts_two_digit_years(parsed)
+        out[todo] = parsed.to_numpy("datetime64[us]")
+        todo = todo[np.isnat(out[todo])]
+        if len(todo) == 0:
+            break
+    return out
+
+
+def ts_two_digit_years(parsed):
+    # %y puts two-digit years in 1969-2068, dateutil within 50 years of
+    # the current year (for 2026: 1976-2075); move %y results to the
+    # dateutil year. A date that does not exist there (Feb 29) becomes
+    # NaT and goes to the scalar parser, which rejects it.
+    parsed = pd.DatetimeIndex(parsed)
+    now = time.localtime().tm_year
+    years = now // 100 * 100 + parsed.year % 100
+    years = np.where(years >= now + 50, years - 100, years)
+    years = np.where(years < now - 50, years + 100, years)
+    move = ~parsed.isna() & (years != parsed.year)
+    if not move.any():
+        return parsed
+    moved = pd.to_datetime(pd.DataFrame({
+        "year": years[move], "month": parsed.month[move], "day": parsed.day[move],
+        "hour": parsed.hour[move], "minute": parsed.minute[move],
+        "second": parsed.second[move], "microsecond": parsed.microsecond[move],
+    }), errors="coerce")
+    out = parsed.to_numpy("datetime64[us]").copy()
+    out[move] = moved.to_numpy("datetime64[us]")
+    return pd.DatetimeIndex(out)
+
+
+def parse_timestamp_column(values, parse_one=clean_timestamp_strict):
+    # Every distinct raw string is parsed once
+    codes, uniques = pd.factorize(values)
+    norm = ts_normalize(pd.Series(uniques, dtype="string"))
+    fp_codes, fps = pd.factorize(ts_fingerprint(norm))
+    norm = norm.to_numpy(dtype=object)
+
+    parsed = np.full(len(uniques), np.datetime64("NaT"), dtype="datetime64[us]")
+    slow = np.zeros(len(uniques), dtype=bool)
+
+    for code, idx in pd.Series(fp_codes).groupby(fp_codes).indices.items():
+        formats = ts_formats(fps[code])
+        if formats:
+            sample = idx[:TS_SAMPLE_SIZE]
+            expected = pd.to_datetime(
+                pd.Series([parse_one(v) for v in uniques[sample]], dtype=object)
+            ).to_numpy("datetime64[us]")
+            if not np.array_equal(ts_cascade(norm[sample], formats), expected, equal_nan=True):
+                formats = None
+
+        if formats is None:
+            slow[idx] = True
+        elif formats:
+            parsed[idx] = ts_cascade(norm[idx], formats)
+            slow[idx] = np.isnat(parsed[idx])
+
+    # Fuzzy dateutil only for the leftovers
+    leftovers = pd.Series([parse_one(v) for v in uniques[slow]], dtype=object)
+    parsed[slow] = pd.to_datetime(leftovers).to_numpy("datetime64[us]")
+
+    out = pd.Series(parsed[codes], index=values.index)
+    out[codes < 0] = pd.NaT
+    return out
+
+
+def parse_timestamp_array(values, parse_one=clean_timestamp_strict):
+    """parse_timestamp_column for an Arrow string array.
+
+    The array is dictionary-encoded, its distinct strings are parsed as
+    above and the timestamps are taken back out by index; bad values
+    are null.
+    """
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    encoded = pc.dictionary_encode(values)
+    uniques = pd.Series(encoded.dictionary.to_numpy(zero_copy_only=False), dtype=object)
+    parsed = parse_timestamp_column(uniques, parse_one).to_numpy("datetime64[us]")
+    return pc.take(pa.array(parsed, from_pandas=True), encoded.indices)